@@ -5,10 +5,16 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from src.database import init_db
-from src.queue import QueueChangeStream
+from src.auth.utils import load_jwt_secret
+from src.config import CONFIG
+from src.database import close_client, init_db
+from src.order.write_batcher import stop_write_batcher
+from src.queue import get_queue_change_stream, init_queue_change_stream
 from src.service import send_new_order_message
-from src.websocket_manager import WebsocketManager
+from src.websocket_manager import (
+    init_websocket_manager,
+    shutdown_websocket_manager,
+)
 
 
 DESCRIPTION = """
@@ -18,32 +24,46 @@ Donut-Diaries API
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Read the jwt secret off the event loop before serving requests
+    app.state.jwt_secret = await load_jwt_secret()
+
     await init_db(app)
 
     # WebsocketManager that can only be shutdown in this module
-    WebsocketManager(__name__)
+    init_websocket_manager(__name__)
 
     # Initialize new queue change stream
-    QueueChangeStream(app.db)
+    queue_change_stream = init_queue_change_stream(app.db)
+
+    # Long running tasks, cancelled and awaited on shutdown
+    app.state.background_tasks = []
 
     # Create task to continuously watch the query collection
-    task = asyncio.create_task(
-        QueueChangeStream.watch(on_change=send_new_order_message)
+    app.state.background_tasks.append(
+        asyncio.create_task(
+            queue_change_stream.watch(on_change=send_new_order_message)
+        )
     )
 
     yield
 
-    # Cancel the query collection watcher task
-    task.cancel()
+    # Cancel the background tasks and wait for them to finish
+    for task in app.state.background_tasks:
+        task.cancel()
+
+    await asyncio.gather(*app.state.background_tasks, return_exceptions=True)
+
+    # Write the batched order updates before closing the database
+    await stop_write_batcher()
 
     # Ensure queue change stream is closed.
-    await QueueChangeStream.close()
+    await get_queue_change_stream().close()
 
     # Close all open websockets
-    await WebsocketManager.shutdown()
+    await shutdown_websocket_manager()
 
     # Close the database connection
-    app.client.close()
+    close_client()
 
 app = FastAPI(
     title="Donut-Diaries API",
@@ -61,15 +81,26 @@ app = FastAPI(
 
 LOCALHOST = os.getenv("DD_DEV_HOST", "")
 
-origins = ["https://dd-customer.vercel.app/"]
-
-if LOCALHOST:
-    origins.append(LOCALHOST)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# Browsers send the `Origin` header without a trailing slash. A frozenset
+# makes the origin check in `CORSMiddleware` a hash lookup.
+ORIGINS = frozenset(
+    {"https://dd-customer.vercel.app"}
+    | ({LOCALHOST.rstrip("/")} if LOCALHOST else set())
 )
+
+# Explicit methods and headers let Starlette build the preflight response
+# headers once instead of echoing the requested ones on every preflight.
+CORS_METHODS = ("GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS")
+CORS_HEADERS = ("authorization", "content-type")
+
+# When CORS headers are added by the proxy in front of the API the
+# middleware is skipped, saving a layer on every request. The proxy must
+# then only allow `ORIGINS`. A dev host always needs the middleware.
+if not CONFIG.CORS_AT_EDGE or LOCALHOST:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=ORIGINS,
+        allow_credentials=True,
+        allow_methods=CORS_METHODS,
+        allow_headers=CORS_HEADERS,
+    )
@@ -1,22 +1,41 @@
-from pydantic import BaseModel
+import hashlib
+import threading
+import time
+
+import msgspec
+from cachetools import TTLCache
 from typing import Optional
+from uuid import UUID
 
 from fastapi import HTTPException, Request
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.security import HTTPBearer
 from typing_extensions import Annotated, Doc
 
-from src.auth.utils import decodeJWT
+from src.auth.utils import (
+    JWT_CACHE_MAXSIZE,
+    JWT_CACHE_TTL,
+    decodeJWT,
+    on_jwt_secret_change,
+)
 
 
-class SupabaseJWTPayload(BaseModel):
+class SupabaseJWTPayload(msgspec.Struct, kw_only=True):
     """
     The result of using `SupabaseJWTBearer` in a dependency.
 
     Includes `sub`, `email`, `phone`, `is_anonymous` and `user_metadata`
     fields of the payload.
+
+    A `msgspec.Struct` rather than a pydantic model since it is only a
+    carrier for the decoded token and is built on every new token. Use
+    `msgspec.structs.asdict` to get its fields as a dict.
+
+    `sub` and `is_anonymous` are required, a token missing either of them
+    is rejected. The fields are keyword only so that the required
+    `is_anonymous` can follow the fields with defaults.
     """
 
-    sub: Annotated[str, Doc("UUID of the user")]
+    sub: Annotated[UUID, Doc("UUID of the user")]
     email: Annotated[
         str,
         Doc(
@@ -26,7 +45,7 @@ class SupabaseJWTPayload(BaseModel):
             If user is anonymous the email will be an empty string
             """
         ),
-    ]
+    ] = ""
     phone: Annotated[
         str,
         Doc(
@@ -37,7 +56,7 @@ class SupabaseJWTPayload(BaseModel):
             be an empty string
             """
         ),
-    ]
+    ] = ""
     is_anonymous: Annotated[bool, Doc("Whether the user is anonymous")]
     user_metadata: Annotated[
         dict,
@@ -49,7 +68,24 @@ class SupabaseJWTPayload(BaseModel):
             `is_vendor` is set to true for a vendor user.
             """
         ),
-    ]
+    ] = {}
+
+
+# Validated payloads mapped to the `exp` of their token so that repeated
+# requests skip both the JWT verification and the payload validation.
+_payload_cache: TTLCache = TTLCache(
+    maxsize=JWT_CACHE_MAXSIZE, ttl=JWT_CACHE_TTL
+)
+_payload_cache_lock = threading.Lock()
+
+
+def _clear_payload_cache() -> None:
+    """Drops the payloads of tokens decoded with the previous secret."""
+    with _payload_cache_lock:
+        _payload_cache.clear()
+
+
+on_jwt_secret_change(_clear_payload_cache)
 
 
 class SupabaseJWTBearer(HTTPBearer):
@@ -88,25 +124,54 @@ class SupabaseJWTBearer(HTTPBearer):
         super(SupabaseJWTBearer, self).__init__()
 
     async def __call__(self, request: Request) -> Optional[SupabaseJWTPayload]:
-        credentials: HTTPAuthorizationCredentials = await super(
-            SupabaseJWTBearer, self
-        ).__call__(request)
+        # Parse the header directly instead of going through
+        # `HTTPBearer.__call__` which builds `HTTPAuthorizationCredentials`
+        # for every request. The raw ASGI headers are scanned so that no
+        # `Headers` wrapper is built, header names there are lowercase.
+        authorization = None
+
+        for name, value in request.scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+
+        if not authorization:
+            raise HTTPException(status_code=403, detail="Not authenticated")
 
-        if credentials:
-            if not credentials.scheme == "Bearer":
-                raise HTTPException(
-                    status_code=403, detail="Invalid authentication scheme."
-                )
+        scheme, _, token = authorization.partition(" ")
 
-            payload = decodeJWT(credentials.credentials, "authenticated")
+        if not token:
+            raise HTTPException(status_code=403, detail="Not authenticated")
 
-            if not payload:
-                raise HTTPException(
-                    status_code=403, detail="Invalid token or expired token."
-                )
+        if scheme.lower() != "bearer":
+            raise HTTPException(
+                status_code=403, detail="Invalid authentication scheme."
+            )
+
+        key = hashlib.sha256(token.encode()).digest()
+
+        with _payload_cache_lock:
+            cached = _payload_cache.get(key)
+
+        if cached is not None and cached[1] >= time.time():
+            return cached[0]
+
+        payload = decodeJWT(token, "authenticated")
 
-            return SupabaseJWTPayload(**payload)
-        else:
+        if not payload:
             raise HTTPException(
-                status_code=403, detail="Invalid authorization code."
+                status_code=403, detail="Invalid token or expired token."
             )
+
+        try:
+            # `sub` is parsed into a UUID once per token
+            supabase_payload = msgspec.convert(payload, SupabaseJWTPayload)
+        except msgspec.ValidationError:
+            raise HTTPException(
+                status_code=403, detail="Invalid token or expired token."
+            )
+
+        with _payload_cache_lock:
+            _payload_cache[key] = (supabase_payload, payload["exp"])
+
+        return supabase_payload
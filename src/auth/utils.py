@@ -1,7 +1,13 @@
+import asyncio
+import base64
+import hashlib
+import threading
 import time
-from typing import Any, Dict
+from typing import Any, Callable, Dict
 
 import jwt
+import msgspec
+from cachetools import TTLCache
 
 from src.config import CONFIG
 from src.auth.exceptions import JWTSecretUndefined, JWTSecretFileNotFound
@@ -38,8 +44,111 @@ def get_jwt_secret() -> str:
     raise JWTSecretUndefined
 
 
-JWT_SECRET: str = get_jwt_secret()
 JWT_ALGORITHM = CONFIG.JWT_ALGORITHM
+JWT_ALGORITHMS = [JWT_ALGORITHM]
+
+
+class _PyJWT(jwt.PyJWT):
+    """`PyJWT` decoding the payload with `msgspec.json` instead of `json`."""
+
+    def _decode_payload(self, decoded: dict[str, Any]) -> Any:
+        try:
+            payload = msgspec.json.decode(decoded["payload"])
+        except msgspec.DecodeError as e:
+            raise jwt.DecodeError(f"Invalid payload string: {e}")
+        if not isinstance(payload, dict):
+            raise jwt.DecodeError(
+                "Invalid payload string: must be a json object"
+            )
+        return payload
+
+
+# Reused decoder. The secret is loaded by `load_jwt_secret` during the app
+# lifespan, or lazily on first use, and kept as bytes so `decodeJWT` does not
+# encode it on every call.
+_jwt_decoder = _PyJWT()
+_jwt_secret: str | None = None
+_jwt_key: bytes | None = None
+
+# Decoded tokens are kept for at most `JWT_CACHE_TTL` seconds so a revoked or
+# re-issued token is not trusted for longer than that.
+JWT_CACHE_TTL = 30
+JWT_CACHE_MAXSIZE = 10000
+
+_jwt_cache: TTLCache = TTLCache(maxsize=JWT_CACHE_MAXSIZE, ttl=JWT_CACHE_TTL)
+_jwt_cache_lock = threading.Lock()
+
+# Called by `set_jwt_secret` to clear the caches of tokens decoded with the
+# previous secret which are kept outside of this module.
+_secret_change_hooks: list[Callable[[], None]] = []
+
+
+def on_jwt_secret_change(hook: Callable[[], None]) -> None:
+    """
+    Registers a function called when the jwt secret is changed.
+
+    Args:
+        `hook` (Callable[[], None]): Function clearing a cache of tokens
+            decoded with the previous secret.
+    """
+    _secret_change_hooks.append(hook)
+
+
+def set_jwt_secret(secret: str) -> None:
+    """
+    Sets the secret used by `signJWT` and `decodeJWT`.
+
+    Tokens decoded with the previous secret are dropped from the cache and
+    the hooks registered with `on_jwt_secret_change` are called.
+
+    Args:
+        `secret` (str): jwt secret
+    """
+    global _jwt_secret, _jwt_key
+
+    _jwt_secret = secret
+    _jwt_key = secret.encode()
+
+    with _jwt_cache_lock:
+        _jwt_cache.clear()
+
+    for hook in _secret_change_hooks:
+        hook()
+
+
+async def load_jwt_secret() -> str:
+    """
+    Reads the jwt secret in a worker thread, since `JWT_SECRET_FILE` may
+    have to be read from disk, and sets it with `set_jwt_secret`.
+
+    Raises:
+        `JWTSecretUndefined`: Raised if the `JWT_SECRET` is not set and cannot
+            be read from `JWT_SECRET_FILE`
+        `JWTSecretFileNotFound`: If the given `JWT_SECRET_FILE` is not found.
+
+    Returns:
+        `str`: jwt secret
+    """
+    secret = await asyncio.to_thread(get_jwt_secret)
+    set_jwt_secret(secret)
+
+    return secret
+
+
+def _get_jwt_secret() -> str:
+    """Returns the loaded jwt secret, loading it first if needed."""
+    if _jwt_secret is None:
+        set_jwt_secret(get_jwt_secret())
+
+    return _jwt_secret
+
+
+def _get_jwt_key() -> bytes:
+    """Returns the loaded jwt secret as bytes, loading it first if needed."""
+    if _jwt_key is None:
+        set_jwt_secret(get_jwt_secret())
+
+    return _jwt_key
 
 
 def token_response(token: str):
@@ -63,6 +172,7 @@ def signJWT(
     ### Note:
     * `JWT_SECRET` env variable should be set to the jwt secret
     * `JWT_ALGORITHM` env variable should be set to the algorithm to use
+    * The secret is loaded by `load_jwt_secret` at startup, or on first use.
 
     ## Example
 
@@ -78,15 +188,47 @@ def signJWT(
     ```
     """
     _payload = {**payload, "exp": expiry or time.time() + 86400}
-    token = jwt.encode(_payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    token = jwt.encode(_payload, _get_jwt_secret(), algorithm=JWT_ALGORITHM)
 
     return token_response(token)
 
 
+def _jwt_cache_key(
+    token: str, audience: str | None
+) -> tuple[bytes, str | None]:
+    """Key used to store a decoded token in the `_jwt_cache`."""
+    return hashlib.sha256(token.encode()).digest(), audience
+
+
+def _unverified_exp(token: str) -> float | None:
+    """
+    Reads the `exp` claim of a token without verifying its signature.
+
+    Only used to reject expired tokens early, the token must still be
+    verified before it is trusted.
+
+    Returns:
+        float | None: The `exp` claim or None if it cannot be read.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = msgspec.json.decode(base64.urlsafe_b64decode(payload)).get("exp")
+    except Exception:
+        return None
+
+    return exp if isinstance(exp, (int, float)) else None
+
+
 def decodeJWT(token: str, audience: str | None = None) -> dict:
     """
     Decodes provided JWT.
 
+    Successfully decoded tokens are cached for up to `JWT_CACHE_TTL` seconds
+    so that repeated requests with the same token skip the signature
+    verification. Tokens whose `exp` is already past are rejected before
+    their signature is verified.
+
     Args:
         `token` (str): JWT to decode.
         `audience` (str | None): audience of the token. Defaults to None.
@@ -97,12 +239,43 @@ def decodeJWT(token: str, audience: str | None = None) -> dict:
     ### Note:
     * `JWT_SECRET` env variable should be set to the jwt secret
     * `JWT_ALGORITHM` env variable should be set to the algorithm to use
+    * The secret is loaded by `load_jwt_secret` at startup, or on first use.
     """
+    key = _jwt_cache_key(token, audience)
+    now = time.time()
+
+    with _jwt_cache_lock:
+        cached_token = _jwt_cache.get(key)
+
+    if cached_token is not None:
+        if cached_token["exp"] >= now:
+            return cached_token
+
+        with _jwt_cache_lock:
+            _jwt_cache.pop(key, None)
+
+        return None
+
+    # Skip the signature verification for tokens that are already expired.
+    exp = _unverified_exp(token)
+
+    if exp is not None and exp < now:
+        return {}
+
     try:
-        decoded_token = jwt.decode(
-            token, JWT_SECRET, algorithms=[JWT_ALGORITHM], audience=audience
+        decoded_token = _jwt_decoder.decode(
+            token,
+            _jwt_key or _get_jwt_key(),
+            algorithms=JWT_ALGORITHMS,
+            audience=audience,
         )
 
-        return decoded_token if decoded_token["exp"] >= time.time() else None
+        if decoded_token["exp"] < now:
+            return None
     except Exception:
         return {}
+
+    with _jwt_cache_lock:
+        _jwt_cache[key] = decoded_token
+
+    return decoded_token
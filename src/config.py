@@ -18,6 +18,44 @@ class Config(BaseModel):
     MONGODB_HOST: str = config("MONGODB_HOST", "localhost")
     MONGODB_PORT: str = config("MONGODB_PORT", "27017")
     MONGODB_SCHEME: str = config("MONGODB_SCHEME", "mongodb")
+    MONGODB_DATABASE: str = config("MONGODB_DATABASE", "donut_diaries")
+    # Pool sizes are per worker process, the server sees them multiplied by
+    # the number of workers.
+    MONGODB_MAX_POOL_SIZE: int = config("MONGODB_MAX_POOL_SIZE", 200, cast=int)
+    MONGODB_MIN_POOL_SIZE: int = config("MONGODB_MIN_POOL_SIZE", 10, cast=int)
+    MONGODB_MAX_IDLE_TIME_MS: int = config(
+        "MONGODB_MAX_IDLE_TIME_MS", 300_000, cast=int
+    )
+    MONGODB_MAX_CONNECTING: int = config("MONGODB_MAX_CONNECTING", 4, cast=int)
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = config(
+        "MONGODB_WAIT_QUEUE_TIMEOUT_MS", 2000, cast=int
+    )
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = config(
+        "MONGODB_SERVER_SELECTION_TIMEOUT_MS", 3000, cast=int
+    )
+
+    # Batching of the writes made when creating orders.
+    ORDER_WRITE_BATCH_MAX_SIZE: int = config(
+        "ORDER_WRITE_BATCH_MAX_SIZE", 100, cast=int
+    )
+
+    # Longest time the server waits for queue changes before returning an
+    # empty batch of the change stream.
+    QUEUE_CHANGE_STREAM_MAX_AWAIT_MS: int = config(
+        "QUEUE_CHANGE_STREAM_MAX_AWAIT_MS", 200, cast=int
+    )
+
+    # Most messages waiting to be sent to a websocket before it is closed.
+    WEBSOCKET_SEND_QUEUE_SIZE: int = config(
+        "WEBSOCKET_SEND_QUEUE_SIZE", 256, cast=int
+    )
+    # Longest time a message takes to be sent before the websocket is closed.
+    WEBSOCKET_SEND_TIMEOUT_MS: int = config(
+        "WEBSOCKET_SEND_TIMEOUT_MS", 5000, cast=int
+    )
+
+    # Set when CORS headers are added by the proxy in front of the API.
+    CORS_AT_EDGE: bool = config("CORS_AT_EDGE", False, cast=bool)
 
     # JWT
     JWT_SECRET: str = config("JWT_SECRET", "")
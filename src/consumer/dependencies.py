@@ -1,9 +1,8 @@
 from pydantic_core._pydantic_core import ValidationError
 
 from typing import Annotated
-from uuid import UUID
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 
 from src.auth.jwt_bearer import SupabaseJWTBearer, SupabaseJWTPayload
 
@@ -12,35 +11,52 @@ from src.consumer.models import (
     AnonymousConsumerCreate,
     SignedConsumerCreate,
 )
+from src.consumer.service import cache_consumer, get_cached_consumer
 
 
 def consumer_credentials(
     credentials: Annotated[SupabaseJWTPayload, Depends(SupabaseJWTBearer())]
-) -> dict:
-    """Get dictionary representation of the SupabaseJWTPayload.
+) -> SupabaseJWTPayload:
+    """Get the SupabaseJWTPayload of the consumer.
+
+    The payload is returned as is and its fields read as attributes
+    to avoid converting it into a dict on every request.
 
     Args:
-        credentials (SupabaseJWTPayload): Credentials of the vendor.
+        credentials (SupabaseJWTPayload): Credentials of the consumer.
 
     Returns:
-        dict: Dictionary of the values in SupabaseJWTPayload
+        SupabaseJWTPayload: Credentials of the consumer.
     """
-    return credentials.model_dump()
+    return credentials
 
 
 async def get_consumer(
-    credentials: dict = Depends(consumer_credentials),
+    request: Request,
+    credentials: SupabaseJWTPayload = Depends(consumer_credentials),
 ) -> Consumer:
     """Get a consumer from the database.
 
+    The fetched consumer is stored in the request's scope so that it is
+    only fetched once per request. `request.state` is not used since it
+    can be shared with the lifespan state across requests.
+
     Args:
-        credentials (dict): Dictionary of the consumer's details from the
-            SupabaseJWTPayload.
+        request (Request): The current request.
+        credentials (SupabaseJWTPayload): The consumer's details from the
+            Supabase JWT.
 
     Returns:
         Consumer | None: A consumer from the database or None if not found.
     """
-    return await Consumer.find_one({"_id": UUID(credentials["sub"])})
+    if "consumer" in request.scope:
+        return request.scope["consumer"]
+
+    consumer = await Consumer.find_one({"_id": credentials.sub})
+
+    request.scope["consumer"] = consumer
+
+    return consumer
 
 
 async def consumer_exists(
@@ -58,6 +74,31 @@ async def consumer_exists(
     raise HTTPException(status_code=400, detail="Consumer not found.")
 
 
+async def cached_consumer_exists(
+    request: Request,
+    credentials: SupabaseJWTPayload = Depends(consumer_credentials),
+) -> Consumer:
+    """Validate that a consumer with given credentials exists, reading it
+    from the consumer cache when possible.
+
+    Only use for read only routes, the cached consumer may be up to
+    `CONSUMER_CACHE_TTL` seconds old.
+
+    Raises:
+        HTTPException: If the consumer does not exist.
+    """
+    consumer = get_cached_consumer(credentials.sub)
+
+    if consumer is None:
+        consumer = await consumer_exists(
+            await get_consumer(request, credentials)
+        )
+
+        cache_consumer(consumer)
+
+    return consumer
+
+
 async def consumer_not_exists(
     consumer: Consumer = Depends(get_consumer),
 ) -> None:
@@ -72,15 +113,15 @@ async def consumer_not_exists(
 
 
 async def validate_anonymous_credentials(
-    credentials: dict = Depends(consumer_credentials),
+    credentials: SupabaseJWTPayload = Depends(consumer_credentials),
 ) -> AnonymousConsumerCreate | None:
     """
     Gets credentials from the SupabaseJWT and uses them to create a 
     AnonymousConsumerCreate object.
 
     Args:
-        credentials (dict): Dictionary of the consumer's details from the
-            SupabaseJWTPayload.
+        credentials (SupabaseJWTPayload): The consumer's details from the
+            Supabase JWT.
 
     Raises:
         HTTPException: If there is a validation error
@@ -92,7 +133,7 @@ async def validate_anonymous_credentials(
 
     try:
         anonymous_consumer = AnonymousConsumerCreate(
-            id=credentials["sub"], **credentials
+            id=credentials.sub, is_anonymous=credentials.is_anonymous
         )
         return anonymous_consumer
     except ValidationError as e:
@@ -100,15 +141,15 @@ async def validate_anonymous_credentials(
 
 
 async def validate_signed_credentials(
-    credentials: dict = Depends(consumer_credentials),
+    credentials: SupabaseJWTPayload = Depends(consumer_credentials),
 ) -> SignedConsumerCreate | None:
     """
     Gets credentials from the SupabaseJWT and uses them to create a 
     SignedConsumerCreate object.
 
     Args:
-        credentials (dict): Dictionary of the consumer's details from the
-            SupabaseJWTPayload.
+        credentials (SupabaseJWTPayload): The consumer's details from the
+            Supabase JWT.
 
     Raises:
         HTTPException: If there is a validation error
@@ -120,7 +161,10 @@ async def validate_signed_credentials(
 
     try:
         signed_consumer = SignedConsumerCreate(
-            id=credentials["sub"], **credentials
+            id=credentials.sub,
+            email=credentials.email,
+            phone=credentials.phone,
+            is_anonymous=credentials.is_anonymous,
         )
         return signed_consumer
     except ValidationError as e:
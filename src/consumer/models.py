@@ -79,8 +79,8 @@ class SignedConsumerCreate(ConsumerBase):
     phone: str = ""
     is_anonymous: bool = False
     disabled: bool = False
-    created_at: datetime = datetime.now()
-    updated_at: datetime = datetime.now()
+    created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
 
     @model_validator(mode="after")
     def check_phone_or_email_provided(self):
@@ -89,16 +89,19 @@ class SignedConsumerCreate(ConsumerBase):
         return self
 
     class Config:
-        json_schema_extra = {
-            "example": {
+        @staticmethod
+        def json_schema_extra(schema: dict, model: type) -> None:
+            # Called when the schema is generated, not at import.
+            now = datetime.now()
+
+            schema["example"] = {
                 "email": "one@one.com",
                 "phone": "1234",
                 "is_anonymous": False,
                 "disabled": False,
-                "created_at": datetime.now(),
-                "updated_at": datetime.now(),
+                "created_at": now,
+                "updated_at": now,
             }
-        }
 
 
 class SignedConsumerUpdate(Document):
@@ -143,7 +146,7 @@ class AnonymousConsumerCreate(ConsumerBase):
 
     is_anonymous: bool = True
     disabled: bool = False
-    created_at: datetime = datetime.now()
+    created_at: datetime = Field(default_factory=datetime.now)
 
 
 class AnonymousConsumerOut(ConsumerBase):
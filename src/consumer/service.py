@@ -1,3 +1,9 @@
+import threading
+
+from uuid import UUID
+
+from beanie.odm.utils.dump import get_dict
+from cachetools import TTLCache
 from pymongo.errors import DuplicateKeyError
 
 
@@ -8,10 +14,75 @@ from src.consumer.models import (
     SignedConsumerCreate,
 )
 
+# Consumers served by `/consumer/me` are kept for `CONSUMER_CACHE_TTL`
+# seconds. The cache is per process, writes made by other workers are seen
+# once the entry expires.
+CONSUMER_CACHE_TTL = 30
+CONSUMER_CACHE_MAXSIZE = 10000
+
+_consumer_cache: TTLCache = TTLCache(
+    maxsize=CONSUMER_CACHE_MAXSIZE, ttl=CONSUMER_CACHE_TTL
+)
+_consumer_cache_lock = threading.Lock()
+
+
+def get_cached_consumer(
+    consumer_id: UUID,
+) -> AnonymousConsumer | SignedConsumer | None:
+    """Get a consumer from the cache.
+
+    Args:
+        consumer_id (UUID): Id of the consumer.
+
+    Returns:
+        AnonymousConsumer | SignedConsumer | None: The cached consumer or
+            None if not cached.
+    """
+    with _consumer_cache_lock:
+        return _consumer_cache.get(consumer_id)
+
+
+def cache_consumer(consumer: AnonymousConsumer | SignedConsumer) -> None:
+    """Add a consumer to the cache.
+
+    Args:
+        consumer (AnonymousConsumer | SignedConsumer): The consumer to cache.
+    """
+    with _consumer_cache_lock:
+        _consumer_cache[consumer.id] = consumer
+
+
+def invalidate_cached_consumer(consumer_id: UUID) -> None:
+    """Remove a consumer from the cache after it has been changed.
+
+    Args:
+        consumer_id (UUID): Id of the consumer.
+    """
+    with _consumer_cache_lock:
+        _consumer_cache.pop(consumer_id, None)
+
+
+async def _insert_consumer(
+    consumer: AnonymousConsumer | SignedConsumer,
+) -> None:
+    """Insert a consumer built by the service.
+
+    The consumer has already been validated by pydantic so the server
+    side document validation is skipped. The document is encoded the same
+    way `Document.insert` does to keep the `_class_id` used by the
+    `Consumer` union.
+
+    Args:
+        consumer (AnonymousConsumer | SignedConsumer): Consumer to insert.
+    """
+    await type(consumer).get_motor_collection().insert_one(
+        get_dict(consumer, to_db=True), bypass_document_validation=True
+    )
+
 
 async def create_anonymous_consumer(
     anonymous_consumer: AnonymousConsumerCreate,
-) -> AnonymousConsumer:
+) -> AnonymousConsumer | None:
     """Create a new anonymous consumer.
 
     Args:
@@ -19,13 +90,16 @@ async def create_anonymous_consumer(
             Supabase JWT.
 
     Returns:
-        AnonymousConsumer: The created anonymous consumer.
+        AnonymousConsumer | None: The created anonymous consumer or None
+            if it already exists.
     """
     try:
         consumer: AnonymousConsumer = AnonymousConsumer(
             **anonymous_consumer.model_dump(), orders=[]
         )
-        await consumer.insert()
+        await _insert_consumer(consumer)
+
+        invalidate_cached_consumer(consumer.id)
 
         return consumer
     except DuplicateKeyError:
@@ -34,7 +108,7 @@ async def create_anonymous_consumer(
 
 async def create_signed_consumer(
     signed_consumer: SignedConsumerCreate,
-) -> SignedConsumer:
+) -> SignedConsumer | None:
     """Create a new signed consumer.
 
     Args:
@@ -42,14 +116,17 @@ async def create_signed_consumer(
             Supabase JWT.
 
     Returns:
-        SignedConsumer: The created signed consumer.
+        SignedConsumer | None: The created signed consumer or None if it
+            already exists.
     """
 
     try:
         consumer: SignedConsumer = SignedConsumer(
             **signed_consumer.model_dump(), orders=[]
         )
-        await consumer.insert()
+        await _insert_consumer(consumer)
+
+        invalidate_cached_consumer(consumer.id)
 
         return consumer
     except DuplicateKeyError:
@@ -1,3 +1,6 @@
+import asyncio
+import functools
+
 from fastapi import FastAPI
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -14,44 +17,100 @@ from src.order.models import Order
 from src.queue import Queue
 
 
-def get_mongodb_uri():
+@functools.cache
+def get_mongodb_uri() -> str:
+    """Get the mongo URI, built once from the config.
+
+    Returns:
+        str: `CONFIG.MONGODB_URI` if set, else the URI built from the
+            mongo scheme, credentials, host and port.
+    """
     if CONFIG.MONGODB_URI:
         return CONFIG.MONGODB_URI
 
+    scheme = CONFIG.MONGODB_SCHEME
+    user = CONFIG.MONGODB_USER
+    pw = CONFIG.MONGODB_PW
+    host = CONFIG.MONGODB_HOST
+    port = CONFIG.MONGODB_PORT
+
     return (
-        "{}://{}:{}@{}:{}".format(
-            CONFIG.MONGODB_SCHEME,
-            CONFIG.MONGODB_USER,
-            CONFIG.MONGODB_PW,
-            CONFIG.MONGODB_HOST,
-            CONFIG.MONGODB_PORT,
-        )
-        if CONFIG.MONGODB_PW and CONFIG.MONGODB_USER
-        else "{}://{}:{}".format(
-            CONFIG.MONGODB_SCHEME,
-            CONFIG.MONGODB_HOST,
-            CONFIG.MONGODB_PORT,
-        )
+        "{}://{}:{}@{}:{}".format(scheme, user, pw, host, port)
+        if pw and user
+        else "{}://{}:{}".format(scheme, host, port)
     )
 
 
-async def init_db(app: FastAPI):
-    """Initialize database"""
+# The process wide client and the event loop it was created on. Motor
+# clients are bound to a loop so a new one is created for a new loop.
+_CLIENT: AsyncIOMotorClient | AsyncMongoMockClient | None = None
+_CLIENT_LOOP: asyncio.AbstractEventLoop | None = None
 
-    logger.info("Initializing database")
+
+def get_client() -> AsyncIOMotorClient | AsyncMongoMockClient:
+    """Get the mongo client of the running event loop.
+
+    The client is created on the first call for a loop and reused by
+    later calls, so the process only has one connection pool per loop.
+
+    Returns:
+        AsyncIOMotorClient | AsyncMongoMockClient: The mongo client.
+            `AsyncMongoMockClient` when testing.
+    """
+    global _CLIENT, _CLIENT_LOOP
+
+    loop = asyncio.get_running_loop()
+
+    if _CLIENT is not None and _CLIENT_LOOP is loop:
+        return _CLIENT
 
     uri = get_mongodb_uri()
 
-    app.client = (
-        AsyncIOMotorClient(uri, uuidRepresentation="standard")
+    # A single client, and so a single connection pool, is shared by the
+    # queries and the queue change stream which watches `app.db`.
+    _CLIENT = (
+        AsyncIOMotorClient(
+            uri,
+            uuidRepresentation="standard",
+            maxPoolSize=CONFIG.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=CONFIG.MONGODB_MIN_POOL_SIZE,
+            maxIdleTimeMS=CONFIG.MONGODB_MAX_IDLE_TIME_MS,
+            maxConnecting=CONFIG.MONGODB_MAX_CONNECTING,
+            waitQueueTimeoutMS=CONFIG.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=(
+                CONFIG.MONGODB_SERVER_SELECTION_TIMEOUT_MS
+            ),
+        )
         if CONFIG.ENVIRONMENT != "test"
         else AsyncMongoMockClient(uri, uuidRepresentation="standard")
     )
+    _CLIENT_LOOP = loop
+
+    return _CLIENT
+
+
+def close_client() -> None:
+    """Close the mongo client, the next `get_client` creates a new one."""
+    global _CLIENT, _CLIENT_LOOP
+
+    if _CLIENT is not None:
+        _CLIENT.close()
+
+    _CLIENT = None
+    _CLIENT_LOOP = None
+
+
+async def init_db(app: FastAPI):
+    """Initialize database"""
+
+    logger.info("Initializing database")
+
+    app.client = get_client()
 
     if isinstance(app.client, AsyncMongoMockClient):
         logger.debug("Using test Mongo Client")
 
-    app.db = app.client.donut_diaries
+    app.db = app.client[CONFIG.MONGODB_DATABASE]
 
     await init_beanie(
         app.db,
@@ -65,3 +124,12 @@ async def init_db(app: FastAPI):
             Queue,
         ],
     )
+
+    # Open the minimum pool connections before serving requests so the
+    # first requests do not all wait on new connections.
+    await asyncio.gather(
+        *(
+            app.db.command("ping")
+            for _ in range(max(CONFIG.MONGODB_MIN_POOL_SIZE, 1))
+        )
+    )
@@ -1,7 +1,11 @@
+import atexit
 import logging
+import queue
 import sys
 import os
 
+from logging.handlers import QueueHandler, QueueListener
+
 import uvicorn.logging
 
 DEBUG = os.getenv("DEBUG")
@@ -10,37 +14,70 @@ DEVELOPMENT = os.getenv("DEVELOPMENT")
 # get logger
 logger = logging.getLogger()
 
-# create formatter
-stdout_formatter = uvicorn.logging.DefaultFormatter(
-    fmt="%(levelprefix)s %(asctime)s | %(message)s - %(pathname)s - %(lineno)s"
-)
+# Whether the logger has been configured by `_configure_once`
+_CONFIGURED = False
+
+# Thread formatting and writing the records put in the queue
+_listener: QueueListener | None = None
+
+
+def _configure_once() -> None:
+    """
+    Configures the root logger if it has not been configured yet.
+
+    The logger only puts records in a queue. The formatting and writing
+    to stdout and the log file is done by a `QueueListener` thread so it
+    does not block the event loop.
+    """
+    global _CONFIGURED, _listener
+
+    if _CONFIGURED:
+        return
+
+    # create formatter
+    stdout_formatter = uvicorn.logging.DefaultFormatter(
+        fmt="%(levelprefix)s %(asctime)s | %(message)s - %(pathname)s - %(lineno)s"
+    )
+
+    file_formatter = logging.Formatter(
+        fmt="%(levelname)s - %(asctime)s - %(message)s - %(pathname)s - %(lineno)s"
+    )
+
+    # create handler
+    stream_handler = logging.StreamHandler(sys.stdout)
+
+    stream_handler.setFormatter(stdout_formatter)
+
+    handlers = [stream_handler]
+
+    # Add file_handler in dev
+    if DEVELOPMENT:
+        if DEBUG:
+            file_handler = logging.FileHandler("app-debug.log")
+        else:
+            file_handler = logging.FileHandler("app.log")
+
+        file_handler.setFormatter(file_formatter)
+
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
 
-file_formatter = logging.Formatter(
-    fmt="%(levelname)s - %(asctime)s - %(message)s - %(pathname)s - %(lineno)s"
-)
+    _listener = QueueListener(log_queue, *handlers)
+    _listener.start()
 
-# create handler
-stream_handler = logging.StreamHandler(sys.stdout)
+    # Flush the queued records on exit
+    atexit.register(_listener.stop)
 
-stream_handler.setFormatter(stdout_formatter)
+    logger.handlers = [QueueHandler(log_queue)]
 
-# Add file_handler in dev
-if DEVELOPMENT:
+    # set log level
     if DEBUG:
-        file_handler = logging.FileHandler("app-debug.log")
+        logger.setLevel(logging.DEBUG)
     else:
-        file_handler = logging.FileHandler("app.log")
-        
-    file_handler.setFormatter(file_formatter)
-    
-    logger.handlers = [stream_handler, file_handler]
+        logger.setLevel(logging.INFO)
 
-else:
-    logger.handlers = [stream_handler]
+    _CONFIGURED = True
 
 
-# set log level
-if DEBUG:
-    logger.setLevel(logging.DEBUG)
-else:
-    logger.setLevel(logging.INFO)
+_configure_once()
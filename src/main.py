@@ -12,3 +12,30 @@ async def root():
 app.include_router(consumer_router, prefix="/api")
 app.include_router(vendor_router, prefix="/api")
 app.include_router(order_router, prefix="/api")
+
+
+def check_unique_routes() -> None:
+    """
+    Checks that every path and method pair is handled by a single route.
+
+    A duplicate route is shadowed by the first one and adds to the routes
+    scanned on every request.
+
+    Raises:
+        RuntimeError: If a path and method pair has more than one route.
+    """
+    seen = set()
+
+    for route in app.routes:
+        for method in getattr(route, "methods", None) or {None}:
+            key = (route.path, method)
+
+            if key in seen:
+                raise RuntimeError(
+                    "Duplicate route: {} {}".format(method or "", route.path)
+                )
+
+            seen.add(key)
+
+
+check_unique_routes()
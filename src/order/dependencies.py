@@ -1,14 +1,20 @@
-from collections import defaultdict
+import asyncio
+
 from uuid import UUID
 from typing import Annotated
 
+from beanie import Link
 from fastapi import Depends, HTTPException
-from beanie.operators import In
+from bson import Binary
 
 from src.auth.jwt_bearer import SupabaseJWTBearer, SupabaseJWTPayload
 
 from src.order.models import OrderCreate, FoodItem
-from src.order.schema import FoodPriceView, OrderVendorConsumer
+from src.order.schema import (
+    ConsumerIdView,
+    OrderVendorConsumer,
+    VendorOrderView,
+)
 
 from src.consumer.models import Consumer
 from src.vendor.models import Vendor, Food, STATUS as vendor_status
@@ -26,14 +32,15 @@ def consumer_id(
     Returns:
         UUID: Id of the consumer as UUID
     """
-    id = credentials.model_dump()["sub"]
-
-    return id if isinstance(id, UUID) else UUID(id)
+    return credentials.sub
 
 
-async def get_consumer_from_id(consumer_id: UUID) -> Consumer | None:
+async def get_consumer_from_id(consumer_id: UUID) -> ConsumerIdView | None:
     """
-    Gets the consumer with the given id.
+    Gets the id of the consumer with the given id.
+
+    Only the id is fetched, the existence of the consumer is all that is
+    needed to place an order.
 
     Args:
         consumer_id (UUID): The id of the consumer
@@ -42,9 +49,11 @@ async def get_consumer_from_id(consumer_id: UUID) -> Consumer | None:
         HTTPException: If there is no consumer with the given id
 
     Returns:
-        Consumer | None: The consumer if found, else None
+        ConsumerIdView | None: The consumer if found, else None
     """
-    consumer: Consumer = await Consumer.find_one({"_id": consumer_id})
+    consumer: ConsumerIdView = await Consumer.find_one(
+        {"_id": consumer_id}, projection_model=ConsumerIdView
+    )
 
     if not consumer:
         raise HTTPException(detail="Consumer does not exist", status_code=400)
@@ -52,10 +61,12 @@ async def get_consumer_from_id(consumer_id: UUID) -> Consumer | None:
     return consumer
 
 
-async def get_vendor_from_id(vendor_id: UUID) -> Vendor | None:
+async def get_vendor_from_id(vendor_id: UUID) -> VendorOrderView | None:
     """
     Gets the vendor with the given id.
 
+    Only the `id`, `status`, `menu` and `queue` of the vendor are fetched.
+
 
     Args:
         vendor_id (UUID): The id of the vendor.
@@ -65,9 +76,11 @@ async def get_vendor_from_id(vendor_id: UUID) -> Vendor | None:
         HTTPException: If the vendor's status is closed.
 
     Returns:
-        Vendor | None: The vendor if found, else None
+        VendorOrderView | None: The vendor if found, else None
     """
-    vendor: Vendor = await Vendor.get(vendor_id)
+    vendor: VendorOrderView = await Vendor.find_one(
+        Vendor.id == vendor_id, projection_model=VendorOrderView
+    )
 
     if not vendor:
         raise HTTPException(detail="vendor does not exist", status_code=400)
@@ -78,13 +91,15 @@ async def get_vendor_from_id(vendor_id: UUID) -> Vendor | None:
     return vendor
 
 
-async def validate_foods(foodItems: list[FoodItem], vendor: Vendor) -> None:
+async def validate_foods(
+    foodItems: list[FoodItem], vendor: Vendor | VendorOrderView
+) -> None:
     """
     Validates that the given foods are found in the vendor's menu.
 
     Args:
         foodItems (list[FoodItem]): List of the foods
-        vendor (Vendor): The vendor to check from
+        vendor (Vendor | VendorOrderView): The vendor to check from
 
     Raises:
         HTTPException: If the foodItems list is empty.
@@ -96,13 +111,15 @@ async def validate_foods(foodItems: list[FoodItem], vendor: Vendor) -> None:
             status_code=400, detail="Order must have at least one food"
         )
 
-    vendor_food_ids = [food.to_dict()["id"] for food in vendor.menu]
-    food_ids = [food.food_id for food in foodItems]
+    vendor_food_ids = {
+        str(food.ref.id if isinstance(food, Link) else food.id)
+        for food in vendor.menu
+    }
 
-    for food_id in food_ids:
-        if str(food_id) not in vendor_food_ids:
+    for food in foodItems:
+        if str(food.food_id) not in vendor_food_ids:
             raise HTTPException(
-                detail="Invalid food with id: {}".format(food_id),
+                detail="Invalid food with id: {}".format(food.food_id),
                 status_code=400,
             )
 
@@ -111,27 +128,53 @@ async def validate_total_price(total_price: float, food_items: list[FoodItem]):
     """
     Validates that the total price in the order matches with the ordered foods.
 
+    The total is calculated by the database in a single aggregation so
+    that the foods are not sent over just to be summed.
+
     Args:
         total_price (float): The total price as in the order
         food_items (list[FoodItem]): The foods in the order
 
     Raises:
         HTTPException: If the calculated price from the foods does not match
-            the provided total price.
+            the provided total price or a food is not found.
     """
-    food_ids = [food.food_id for food in food_items]
-
-    foods: Food = (
-        await Food.find(In(Food.id, food_ids)).project(FoodPriceView).to_list()
-    )
-
-    food_items_dict = {food.food_id: food.quantity for food in food_items}
-
-    _total_price: float = sum(
-        [food.price * food_items_dict[food.id] for food in foods]
-    )
-
-    if total_price != _total_price:
+    food_ids = [Binary.from_uuid(food.food_id) for food in food_items]
+
+    # Quantity of the food in the current document of the pipeline
+    quantity = {
+        "$switch": {
+            "branches": [
+                {"case": {"$eq": ["$_id", food_id]}, "then": food.quantity}
+                for food_id, food in zip(food_ids, food_items)
+            ],
+            "default": 0,
+        }
+    }
+
+    result = await Food.aggregate(
+        [
+            {"$match": {"_id": {"$in": food_ids}}},
+            {
+                "$group": {
+                    "_id": None,
+                    "total": {
+                        "$sum": {"$multiply": ["$price.amount", quantity]}
+                    },
+                    "count": {"$sum": 1},
+                }
+            },
+        ]
+    ).to_list()
+
+    # Compared in cents, the database sums the doubles with more precision
+    # than adding them up one after the other, so the totals may differ in
+    # their last bits.
+    if (
+        not result
+        or result[0]["count"] != len(food_ids)
+        or round(total_price * 100) != round(result[0]["total"] * 100)
+    ):
         raise HTTPException(status_code=400, detail="Food prices don't match")
 
 
@@ -139,21 +182,28 @@ def remove_duplicates(food_items: list[FoodItem]):
     """
     Removes duplicates from the foods.
 
+    The quantities of foods given more than once are added up. The
+    list is returned as is if it has no duplicates.
+
     Args:
         food_items (list[FoodItem]): List of foods to clean
     """
 
-    def default_value() -> int:
-        """Returns default value for the defaultdict"""
-        return 0
+    if len({food_item.food_id for food_item in food_items}) == len(
+        food_items
+    ):
+        return food_items
 
-    food_items_dict = defaultdict(default_value)
+    food_items_dict: dict[UUID, int] = {}
 
     for food_item in food_items:
-        food_items_dict[food_item.food_id] += food_item.quantity
+        food_items_dict[food_item.food_id] = (
+            food_items_dict.get(food_item.food_id, 0) + food_item.quantity
+        )
 
+    # The ids and quantities have already been validated
     return [
-        FoodItem(food_id=key, quantity=value)
+        FoodItem.model_construct(food_id=key, quantity=value)
         for key, value in food_items_dict.items()
     ]
 
@@ -164,6 +214,10 @@ async def validate_order_create(
     """
     Validates the values provided to create an order.
 
+    The consumer, the vendor and the total price are fetched and
+    validated concurrently. Errors are raised in the same order as when
+    the checks ran one after the other.
+
     Args:
         order_create (OrderCreate): The order body.
 
@@ -174,16 +228,57 @@ async def validate_order_create(
 
     order_create.consumer_id = consumer_id
 
-    consumer: Consumer = await get_consumer_from_id(consumer_id)
+    order_create.foods = remove_duplicates(order_create.foods)
 
-    vendor: Vendor = await get_vendor_from_id(order_create.vendor_id)
+    consumer, vendor, price_error = await asyncio.gather(
+        get_consumer_from_id(consumer_id),
+        get_vendor_from_id(order_create.vendor_id),
+        validate_total_price(order_create.total_price, order_create.foods),
+        return_exceptions=True,
+    )
 
-    order_create.foods = remove_duplicates(order_create.foods)
+    for result in (consumer, vendor):
+        if isinstance(result, BaseException):
+            raise result
 
     await validate_foods(order_create.foods, vendor=vendor)
 
-    await validate_total_price(order_create.total_price, order_create.foods)
+    if isinstance(price_error, BaseException):
+        raise price_error
 
     return OrderVendorConsumer(
         order_create=order_create, vendor=vendor, consumer=consumer
     )
+
+
+async def validate_orders_create(
+    orders_create: list[OrderCreate], consumer_id: UUID = Depends(consumer_id)
+) -> list[OrderVendorConsumer]:
+    """
+    Validates the values provided to create several orders.
+
+    The orders are validated concurrently, the first invalid order
+    raises its error.
+
+    Args:
+        orders_create (list[OrderCreate]): The orders in the body.
+
+    Raises:
+        HTTPException: If no order is given.
+
+    Returns:
+        list[OrderVendorConsumer]: An object of the order_create,
+            consumer and vendor for each order.
+    """
+
+    if len(orders_create) == 0:
+        raise HTTPException(
+            status_code=400, detail="Must provide at least one order"
+        )
+
+    return await asyncio.gather(
+        *(
+            validate_order_create(order_create, consumer_id)
+            for order_create in orders_create
+        )
+    )
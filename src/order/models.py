@@ -4,6 +4,7 @@ from typing_extensions import Annotated, Doc
 
 from beanie import Document
 from pydantic import BaseModel, Field, field_validator
+from pymongo import ASCENDING, IndexModel
 
 from .utils import id_from_datetime
 
@@ -106,6 +107,12 @@ class Order(Document):
 
     class Settings:
         name = "order"
+        indexes = [
+            # Orders of a vendor, optionally by status
+            IndexModel([("vendor_id", ASCENDING), ("status", ASCENDING)]),
+            # Orders of a consumer
+            IndexModel([("consumer_id", ASCENDING)]),
+        ]
 
 
 class OrderCreate(BaseModel):
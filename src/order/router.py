@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 
 
-from src.order.dependencies import validate_order_create
+from src.order.dependencies import (
+    validate_order_create,
+    validate_orders_create,
+)
 from src.order.models import OrderOut
 from src.order.schema import OrderVendorConsumer, HTTPError
-from src.order.service import create_order
+from src.order.service import create_order, create_orders_bulk
 
 router = APIRouter(prefix="/order", tags=["order"])
 
@@ -41,3 +44,33 @@ async def place_order(
         )
 
     return created_order
+
+
+@router.post(
+    "/bulk",
+    status_code=status.HTTP_201_CREATED,
+    response_model=list[OrderOut],
+    responses={
+        status.HTTP_400_BAD_REQUEST: {
+            "model": HTTPError,
+            "description": "Invalid order",
+        },
+        status.HTTP_403_FORBIDDEN: {
+            "model": HTTPError,
+            "description": "Forbidden",
+        },
+    },
+)
+async def place_orders(
+    orders: list[OrderVendorConsumer] = Depends(validate_orders_create),
+) -> list[OrderOut]:
+    """Make several orders at once"""
+
+    try:
+        created_orders = await create_orders_bulk(orders)
+    except Exception:
+        raise HTTPException(
+            status_code=500, detail="Unable to order currently"
+        )
+
+    return created_orders
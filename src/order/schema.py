@@ -1,10 +1,11 @@
 from uuid import UUID
 
+from beanie import Link
 from pydantic import BaseModel, Field
 
 from src.order.models import OrderCreate
-from src.consumer.models import AnonymousConsumer, SignedConsumer
-from src.vendor.models import Vendor
+from src.vendor.models import STATUS, Food
+from src.queue import Queue
 
 
 class FoodPriceView(BaseModel):
@@ -20,6 +21,38 @@ class FoodPriceView(BaseModel):
         projection = {"_id": 1, "price": "$price.amount"}
 
 
+class ConsumerIdView(BaseModel):
+    """
+    Object for projecting a Consumer object into the `id`.
+
+    Used to check that the consumer of an order exists without loading
+    their orders.
+    """
+
+    id: UUID = Field(alias="_id")
+
+    class Settings:
+        projection = {"_id": 1}
+
+
+class VendorOrderView(BaseModel):
+    """
+    Object for projecting a Vendor object into the `id`, `status`, `menu`
+    and `queue`.
+
+    Used when creating an order without loading the vendor's orders and
+    details. The `menu` is only the references to the foods.
+    """
+
+    id: UUID = Field(alias="_id")
+    status: STATUS
+    menu: list[Link[Food]]
+    queue: Link[Queue]
+
+    class Settings:
+        projection = {"_id": 1, "status": 1, "menu": 1, "queue": 1}
+
+
 class OrderVendorConsumer(BaseModel):
     """
     Model of an `order_create` and the related `vendor` and `consumer`.
@@ -28,8 +61,8 @@ class OrderVendorConsumer(BaseModel):
     """
 
     order_create: OrderCreate
-    vendor: Vendor
-    consumer: AnonymousConsumer | SignedConsumer
+    vendor: VendorOrderView
+    consumer: ConsumerIdView
 
 
 class HTTPError(BaseModel):
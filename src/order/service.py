@@ -1,8 +1,19 @@
-from beanie import WriteRules
+import asyncio
 
-from src.order.schema import OrderVendorConsumer
+from collections import defaultdict
+from uuid import UUID
+
+from beanie import Link
+from bson import Binary, DBRef
+from pymongo import UpdateOne
+
+from src.order.schema import OrderVendorConsumer, VendorOrderView
 from src.order.models import Order
+from src.order.write_batcher import get_write_batcher
 
+from src.consumer.models import Consumer
+from src.consumer.service import invalidate_cached_consumer
+from src.vendor.cache import invalidate_cached_vendor
 from src.vendor.models import Vendor
 
 from src.queue import Queue
@@ -21,29 +32,119 @@ async def create_order(new_order: OrderVendorConsumer) -> Order:
         Order: The new order.
     """
 
-    order: Order = Order(**new_order.order_create.model_dump())
+    orders = await create_orders_bulk([new_order])
+
+    return orders[0]
+
+
+async def create_orders_bulk(
+    new_orders: list[OrderVendorConsumer],
+) -> list[Order]:
+    """
+    Creates new orders and adds them to the relevant consumers and
+    vendors.
+
+    The orders are inserted in one `insert_many`. They are then pushed to
+    the consumers' orders, the vendors' orders and the vendors' queues
+    concurrently, batched with the pushes of other requests.
+
+    Args:
+        new_orders (list[OrderVendorConsumer]): Objects containing the
+            `order_create`, `consumer` and `vendor` of each order.
+
+    Returns:
+        list[Order]: The new orders.
+    """
+
+    orders: list[Order] = [
+        Order(**new_order.order_create.model_dump())
+        for new_order in new_orders
+    ]
+
+    await Order.insert_many(orders)
+
+    consumer_orders: dict[UUID, list[DBRef]] = defaultdict(list)
+    vendor_orders: dict[UUID, list[DBRef]] = defaultdict(list)
+    queue_orders: dict[UUID, list[DBRef]] = defaultdict(list)
+
+    for new_order, order in zip(new_orders, orders):
+        # Reference stored in the order lists, same as a `Link[Order]`
+        order_ref = DBRef(Order.get_collection_name(), order.id)
+
+        consumer_orders[new_order.consumer.id].append(order_ref)
+        vendor_orders[new_order.vendor.id].append(order_ref)
+        queue_orders[queue_id(new_order.vendor)].append(order_ref)
 
-    new_order.consumer.orders.append(order)
-    # Save the new consumer.
-    await new_order.consumer.save()
+    await asyncio.gather(
+        push_orders(Consumer, consumer_orders),
+        push_orders(Vendor, vendor_orders),
+        # Add orders to the queues
+        push_orders(Queue, queue_orders),
+    )
 
-    vendor = new_order.vendor
+    for consumer_id in consumer_orders:
+        invalidate_cached_consumer(consumer_id)
 
-    vendor.orders.append(order)
+    # The orders of the vendors are in the cached vendors
+    for vendor_id in vendor_orders:
+        invalidate_cached_vendor(vendor_id)
 
-    # Add order to the queue
-    await enqueue_order(vendor, order)
+    return orders
 
-    # Save vendor and write the new order and queue to the database
-    await vendor.save(link_rule=WriteRules.WRITE)
 
-    return order
+async def push_orders(
+    document: type[Consumer | Vendor | Queue],
+    orders: dict[UUID, list[DBRef]],
+) -> None:
+    """
+    Appends orders to the `orders` of documents.
+
+    The updates are written by the `WriteBatcher` in one `bulk_write`
+    shared with the concurrent order creations.
+
+    Args:
+        document (type[Consumer | Vendor | Queue]): The document class
+            whose collection is updated.
+        orders (dict[UUID, list[DBRef]]): References to the orders to
+            append, by the id of the document to append them to.
+    """
+
+    await get_write_batcher().write(
+        document.get_motor_collection(),
+        [
+            UpdateOne(
+                {"_id": Binary.from_uuid(id)},
+                {"$push": {"orders": {"$each": order_refs}}},
+            )
+            for id, order_refs in orders.items()
+        ],
+    )
+
+
+def queue_id(vendor: Vendor | VendorOrderView) -> UUID:
+    """
+    Gets the id of the vendor's queue without fetching the queue.
+
+    Args:
+        vendor (Vendor | VendorOrderView): The vendor whose queue id to
+            get.
+
+    Returns:
+        UUID: The id of the queue.
+    """
+
+    if isinstance(vendor.queue, Link):
+        return vendor.queue.ref.id
+
+    return vendor.queue.id
 
 
 async def fetch_queue(vendor: Vendor) -> Queue:
     """
     Fetches the queue from the link stored in vendor.
 
+    No query is made if the queue has already been fetched.
+
     Args:
         vendor (Vendor): The vendor to fetch their queue.
 
@@ -51,6 +152,9 @@ async def fetch_queue(vendor: Vendor) -> Queue:
         Queue: The fetched queue.
     """
 
+    if isinstance(vendor.queue, Queue):
+        return vendor.queue
+
     # Fetch queue from link
     await vendor.fetch_link("queue")
 
@@ -58,18 +162,3 @@ async def fetch_queue(vendor: Vendor) -> Queue:
     # with the data from the linked queue
 
     return vendor.queue
-
-
-async def enqueue_order(vendor: Vendor, order: Order) -> None:
-    """
-    Adds an order to the vendor's queue.
-
-    Args:
-        vendor (Vendor): The vendor to add to their queue
-        order (Order): The order to add to the vendor's queue
-    """
-
-    queue = await fetch_queue(vendor)
-
-    # Add the order at at the end of queue
-    await queue.enqueue(order=order)
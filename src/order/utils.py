@@ -1,4 +1,14 @@
-from datetime import datetime
+import threading
+import time
+
+# Last id given in microseconds since the epoch, ids are strictly increasing
+_last_id_us = 0
+
+# `%Y%m%d%H%M%S` of the last second an id was created in
+_second = -1
+_second_prefix = ""
+
+_id_lock = threading.Lock()
 
 
 def id_from_datetime() -> str:
@@ -9,7 +19,27 @@ def id_from_datetime() -> str:
 
     Example id: `20240419000056631770`
 
+    Ids created within the same microsecond are moved to the next
+    microsecond so that every id is unique and sorts after the previous
+    one. The date part is only formatted once per second.
+
     Returns:
         str: Current timestamp down to microseconds.
     """
-    return datetime.now().strftime("%Y%m%d%H%M%S%f")
+    global _last_id_us, _second, _second_prefix
+
+    with _id_lock:
+        id_us = max(time.time_ns() // 1000, _last_id_us + 1)
+        _last_id_us = id_us
+
+        second, micro = divmod(id_us, 1_000_000)
+
+        if second != _second:
+            _second = second
+            _second_prefix = time.strftime(
+                "%Y%m%d%H%M%S", time.localtime(second)
+            )
+
+        prefix = _second_prefix
+
+    return f"{prefix}{micro:06d}"
@@ -0,0 +1,195 @@
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from src.config import CONFIG
+from src.logger import logger
+
+
+class WriteBatcher:
+    """
+    Coalesces the updates of concurrent requests into one `bulk_write`
+    per collection.
+
+    Writes are queued and a background task takes up to `max_batch_size`
+    of the queued ones, then sends one `bulk_write` for each collection in
+    the batch. A write is sent as soon as the task is free, so writes are
+    only batched when they are queued in the same iteration of the event
+    loop or while the previous batch is written. Every caller waits until
+    its own operations have been written.
+
+    The operations of a collection are written in the order they were
+    queued so that pushes to the same queue keep the orders' order.
+    """
+
+    def __init__(
+        self, max_batch_size: int = CONFIG.ORDER_WRITE_BATCH_MAX_SIZE
+    ):
+        self.max_batch_size = max_batch_size
+
+        # (collection, operations, future) of each write.
+        self._queue: asyncio.Queue[
+            tuple[AsyncIOMotorCollection, list[UpdateOne], asyncio.Future]
+        ] = asyncio.Queue()
+
+        # Runs while there are queued writes and ends once the queue is
+        # empty. The next write starts a new one.
+        self._task: asyncio.Task | None = None
+
+    async def write(
+        self, collection: AsyncIOMotorCollection, operations: list[UpdateOne]
+    ) -> None:
+        """
+        Queues operations and waits until they are written.
+
+        Args:
+            collection (AsyncIOMotorCollection): Collection to write to.
+            operations (list[UpdateOne]): Operations to write.
+
+        Raises:
+            Exception: The error raised by the `bulk_write` of the batch
+                if the operations were not written.
+        """
+
+        if not operations:
+            return
+
+        future = asyncio.get_running_loop().create_future()
+
+        self._queue.put_nowait((collection, operations, future))
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        await future
+
+    async def stop(self) -> None:
+        """Waits until the queued operations are written."""
+
+        # Writes queued while waiting keep the task running, it ends once
+        # they are all written.
+        while self._task is not None and not self._task.done():
+            await self._task
+
+        self._task = None
+
+    async def _run(self):
+        while not self._queue.empty():
+            batch = []
+
+            while (
+                len(batch) < self.max_batch_size
+                and not self._queue.empty()
+            ):
+                batch.append(self._queue.get_nowait())
+
+            await self._flush(batch)
+
+    async def _flush(
+        self,
+        batch: list[
+            tuple[AsyncIOMotorCollection, list[UpdateOne], asyncio.Future]
+        ],
+    ):
+        writes: dict[
+            str,
+            tuple[
+                AsyncIOMotorCollection,
+                list[UpdateOne],
+                list[tuple[int, asyncio.Future]],
+            ],
+        ] = {}
+
+        for collection, operations, future in batch:
+            _, collection_operations, futures = writes.setdefault(
+                collection.full_name, (collection, [], [])
+            )
+            collection_operations.extend(operations)
+
+            # Index after the last operation of the write
+            futures.append((len(collection_operations), future))
+
+        await asyncio.gather(
+            *(
+                self._bulk_write(collection, operations, futures)
+                for collection, operations, futures in writes.values()
+            )
+        )
+
+    async def _bulk_write(
+        self,
+        collection: AsyncIOMotorCollection,
+        operations: list[UpdateOne],
+        futures: list[tuple[int, asyncio.Future]],
+    ):
+        try:
+            await collection.bulk_write(operations, ordered=True)
+        except BulkWriteError as e:
+            # The writes stop at the first failed operation, the writes
+            # whose operations were all before it are done.
+            failed_index = min(
+                error["index"] for error in e.details["writeErrors"]
+            )
+
+            logger.error(
+                "Batched write to %s failed at operation %s",
+                collection.full_name,
+                failed_index,
+            )
+
+            for end, future in futures:
+                if future.done():
+                    continue
+
+                if end <= failed_index:
+                    future.set_result(None)
+                else:
+                    future.set_exception(e)
+        except Exception as e:
+            logger.error(
+                "Batched write to %s failed: %s", collection.full_name, e
+            )
+
+            for _, future in futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _, future in futures:
+                if not future.done():
+                    future.set_result(None)
+
+
+# The batcher of the running event loop. Its queue and task are bound to
+# the loop so a new one is created for a new loop.
+_BATCHER: WriteBatcher | None = None
+_BATCHER_LOOP: asyncio.AbstractEventLoop | None = None
+
+
+def get_write_batcher() -> WriteBatcher:
+    """Get the write batcher of the running event loop.
+
+    Returns:
+        WriteBatcher: The write batcher.
+    """
+    global _BATCHER, _BATCHER_LOOP
+
+    loop = asyncio.get_running_loop()
+
+    if _BATCHER is None or _BATCHER_LOOP is not loop:
+        _BATCHER = WriteBatcher()
+        _BATCHER_LOOP = loop
+
+    return _BATCHER
+
+
+async def stop_write_batcher() -> None:
+    """Stop the write batcher after writing the queued operations."""
+    global _BATCHER, _BATCHER_LOOP
+
+    if _BATCHER is not None and _BATCHER_LOOP is asyncio.get_running_loop():
+        await _BATCHER.stop()
+
+    _BATCHER = None
+    _BATCHER_LOOP = None
@@ -1,17 +1,37 @@
 from __future__ import annotations
 
+import asyncio
 from uuid import UUID, uuid4
 from pydantic import Field
-from typing_extensions import Annotated, Any, Doc
+from typing_extensions import Annotated, Doc
 
-from beanie import Document, Link, Indexed, WriteRules
+from beanie import Document, Link, Indexed, UpdateResponse
+from bson import DBRef
 from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorChangeStream
 
+from src.config import CONFIG
 from src.logger import logger
 
 from src.order.models import Order, STATUS
 
 
+def order_ref(order: Order | Link[Order]) -> DBRef:
+    """
+    Gets the reference stored in the queue for an order.
+
+    Args:
+        order (Order | Link[Order]): The order or the link to it.
+
+    Returns:
+        DBRef: Reference to the order, same as a stored `Link[Order]`.
+    """
+
+    if isinstance(order, Link):
+        return order.ref
+
+    return DBRef(Order.get_collection_name(), order.id)
+
+
 class Queue(Document):
     """Document representing a vendor's queue"""
 
@@ -57,6 +77,9 @@ class Queue(Document):
         """
         Adds a new order to the queue.
 
+        Only the reference to the order is pushed to the stored queue, the
+        rest of the queue is not rewritten.
+
         Args:
             order (Order): The order to add to the queue.
             at_front (bool, optional): Whether to add the order at the front.
@@ -65,232 +88,389 @@ class Queue(Document):
 
         # TODO: Add option to add order at the front.
 
-        self.orders.append(order)
+        await self.update({"$push": {"orders": order_ref(order)}})
 
-        await self.save()
+        # Updated by hand, `update` does not merge back links
+        self.orders.append(order)
 
     async def dequeue(self) -> Order:
         """
         Removes the oldest order from the orders list and makes it the current order.
 
+        The queue is only updated if its first order is still the one being
+        dequeued, else its orders are fetched again and the new first order
+        is dequeued. The status of the order is then set and the order is
+        returned by the same `find_one_and_update`.
+
         Returns:
             Order: The order that has been removed from the orders list
         """
-        if len(self.orders) > 0:
-            self.current_order = self.orders.pop(0)
+        while len(self.orders) > 0:
+            head = order_ref(self.orders[0])
+
+            result = await Queue.find_one(
+                {"_id": self.id, "orders.0": head}
+            ).update(
+                {"$pop": {"orders": -1}, "$set": {"current_order": head}},
+                response_type=UpdateResponse.UPDATE_RESULT,
+            )
 
-            await self.fetch_link("current_order")
+            if result.matched_count == 0:
+                # The queue changed since it was fetched. It is fetched
+                # again as `sync` does not merge back links either.
+                queue = await Queue.get(self.id)
 
-            self.current_order.status = STATUS.PROCESSING
+                self.orders = queue.orders if queue else []
+                continue
 
-        else:
-            self.current_order = None
+            # Updated by hand, the update does not return the queue
+            del self.orders[0]
+
+            self.current_order = await Order.find_one(
+                Order.id == head.id
+            ).update(
+                {"$set": {"status": STATUS.PROCESSING}},
+                response_type=UpdateResponse.NEW_DOCUMENT,
+            )
 
-        await self.save(link_rule=WriteRules.WRITE)
+            return self.current_order
+
+        await self.update({"$set": {"current_order": None}})
 
         return self.current_order
 
+    @classmethod
+    async def dequeue_by_id(cls, queue_id: UUID) -> Order | None:
+        """
+        Removes the oldest order from a queue without fetching the queue
+        first and makes it the current order.
+
+        The order is popped by one `find_one_and_update` which returns the
+        popped reference, so concurrent dequeues never get the same order.
+        The current order of the queue and the status of the order are
+        then set together.
+
+        Args:
+            queue_id (UUID): ID of the queue.
+
+        Returns:
+            Order | None: The order that has been removed from the queue or
+                None if the queue has no orders.
+        """
+
+        queue = await cls.find_one(
+            {"_id": queue_id, "orders.0": {"$exists": True}}
+        ).update(
+            {"$pop": {"orders": -1}},
+            response_type=UpdateResponse.OLD_DOCUMENT,
+            # Only the popped order of the orders is returned
+            projection={
+                "name": 1,
+                "current_order": 1,
+                "orders": {"$slice": 1},
+            },
+        )
+
+        if queue is None:
+            await cls.find_one(cls.id == queue_id).update(
+                {"$set": {"current_order": None}}
+            )
+
+            return None
+
+        head = order_ref(queue.orders[0])
+
+        _, order = await asyncio.gather(
+            cls.find_one(cls.id == queue_id).update(
+                {"$set": {"current_order": head}}
+            ),
+            Order.find_one(Order.id == head.id).update(
+                {"$set": {"status": STATUS.PROCESSING}},
+                response_type=UpdateResponse.NEW_DOCUMENT,
+            ),
+        )
+
+        return order
+
     async def done(self):
         """Marks an order as completed
 
         The order being completed is `self.current_order` which is the order
-        that was being processed if any.
+        that was being processed if any. Only the status of the order is
+        updated.
         """
 
         if self.current_order:
-            await self.fetch_link("current_order")
-            self.current_order.status = STATUS.COMPLETED
-
-            await self.save(link_rule=WriteRules.WRITE)
+            self.current_order = await Order.find_one(
+                Order.id == order_ref(self.current_order).id
+            ).update(
+                {"$set": {"status": STATUS.COMPLETED}},
+                response_type=UpdateResponse.NEW_DOCUMENT,
+            )
 
     class Settings:
         name = "queue"
 
 
+# Listen for the update operation and send change if updated field is
+# orders. A `$push` to orders is reported as an `orders.<index>` field
+# so the field names are matched. Built once for all the cursors, pymongo
+# copies it into the full pipeline of each change stream.
+_PIPELINE = [
+    {
+        "$match": {
+            "operationType": "update",
+            "$expr": {
+                "$anyElementTrue": [
+                    {
+                        "$map": {
+                            "input": {
+                                "$objectToArray": "$updateDescription.updatedFields"
+                            },
+                            "in": {
+                                "$regexMatch": {
+                                    "input": "$$this.k",
+                                    "regex": r"^orders(\.|$)",
+                                }
+                            },
+                        }
+                    }
+                ]
+            },
+        }
+    }
+]
+
+
 class QueueChangeStream:
-    """Manage the change stream on the queue collection.
+    """Change stream on the queue collection.
 
     This change stream is what alerts the websocket to send a message
     to the vendor with an updated count of the current orders.
 
-    Pipeline used for che change stream listens to `update` operation
-    and if the updated field is `orders`.
-    """
-
-    _instance: Annotated[
-        None | __QueueChangeStream,
-        Doc(
-            """
-            An instance of the `__QueueChangeStream` inner class.
-            """
-        ),
-    ] = None
+    Pipeline used for the change stream listens to `update` operation
+    and if the updated field is `orders` or an element of it.
 
-    @classmethod
-    async def close(cls):
-        """Closes the change stream"""
+    The app has one instance, see `init_queue_change_stream` and
+    `get_queue_change_stream`.
+    """
 
-        if cls._instance:
-            await cls._instance.close()
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        full_document: str = "updateLookup",
+        batch_window_ms: int = 5,
+        max_await_time_ms: int = CONFIG.QUEUE_CHANGE_STREAM_MAX_AWAIT_MS,
+        max_concurrency: int = 100,
+        **kwargs,
+    ):
+        logger.debug("Creating QueueChangeStream")
+
+        self.db: Annotated[
+            AsyncIOMotorDatabase,
+            Doc(
+                """
+                The database where the queue collection is found
+                """
+            ),
+        ] = db
+
+        self.full_document: Annotated[
+            str,
+            Doc(
+                """
+                Option to fetch the full document from the change
+                stream watcher.
+                """
+            ),
+        ] = full_document
+
+        self.batch_window: Annotated[
+            float,
+            Doc(
+                """
+                Seconds during which changes are batched before
+                on_change is called.
+                """
+            ),
+        ] = batch_window_ms / 1000
+
+        self.max_await_time_ms: Annotated[
+            int,
+            Doc(
+                """
+                Milliseconds the server waits for new changes before
+                returning a batch of the change stream.
+                """
+            ),
+        ] = max_await_time_ms
+
+        self.max_concurrency: Annotated[
+            int,
+            Doc(
+                """
+                Most on_change calls running at the same time.
+                """
+            ),
+        ] = max_concurrency
+
+        self.__watching: Annotated[
+            bool,
+            Doc(
+                """
+                Whether there is an ongoing watch
+                """
+            ),
+        ] = False
+
+        self.__change_stream_cursor: Annotated[
+            AsyncIOMotorChangeStream | None,
+            Doc(
+                """
+                Cursor to iterate over changes in the queue collection
+                """
+            ),
+        ] = None
+
+    def cursor(self) -> AsyncIOMotorChangeStream:
+        """Gets the change stream cursor."""
+
+        if not self.__change_stream_cursor:
+            self.__change_stream_cursor = self.db.queue.watch(
+                pipeline=_PIPELINE,
+                full_document=self.full_document,
+                max_await_time_ms=self.max_await_time_ms,
+            )
 
-    @classmethod
-    def cursor(cls):
-        """Returns a cursor to the change stream"""
+        return self.__change_stream_cursor
 
-        if cls._instance:
-            return cls._instance.cursor()
-
-    @classmethod
-    async def watch(cls, on_change: callable):
-        """Creates a change stream and watches for any changes.
+    async def watch(self, on_change: callable, **kwargs):
+        """Watches changes for the queue collection and calls
+        on_change whenever there is a change.
 
         Args:
-            on_change (callable): Callable to be called when changes occur.
+            on_change (callable): The callback to call when there
+                is a change.
         """
+        change_stream = self.cursor()
 
-        if cls._instance:
-            await cls._instance.watch(on_change=on_change)
-
-    class __QueueChangeStream:
-        def __init__(
-            self,
-            db: AsyncIOMotorDatabase,
-            full_document: str | None = None,
-            **kwargs,
-        ):
-            logger.debug("Creating QueueChangeStream")
-
-            # Listen for the update operation and send change if updated
-            # field is orders
-            self.pipeline = [
-                {
-                    "$match": {
-                        "operationType": "update",
-                        "updateDescription.updatedFields.orders": {
-                            "$exists": True
-                        },
-                    }
-                }
-            ]
-
-            self.db: Annotated[
-                AsyncIOMotorDatabase,
-                Doc(
-                    """
-                    The database where the queue collection is found
-                    """
-                ),
-            ] = db
-
-            self.full_document: Annotated[
-                str,
-                Doc(
-                    """
-                    Option to fetch the full document from the change
-                    stream watcher.
-                    """
-                ),
-            ] = (
-                full_document or "updateLookup"
-            )
+        if not self.__watching:
+            self.__watching = True
+            logger.info("Starting Queue Change Stream")
 
-            self.__watching: Annotated[
-                bool,
-                Doc(
-                    """
-                    Whether there is an ongoing watch
-                    """
-                ),
-            ] = False
-
-            self.__change_stream_cursor: Annotated[
-                AsyncIOMotorChangeStream | None,
-                Doc(
-                    """
-                    Cursor to iterate over changes in the queue collection
-                    """
-                ),
-            ] = None
-
-        def cursor(self) -> AsyncIOMotorChangeStream:
-            """Gets the change stream cursor."""
-
-            pipeline = self.pipeline
-            full_document = self.full_document
-
-            if not self.__change_stream_cursor:
-                self.__change_stream_cursor = self.db.queue.watch(
-                    pipeline=pipeline,
-                    full_document=full_document,
-                    max_await_time_ms=1,
-                )
-
-            return self.__change_stream_cursor
-
-        async def watch(self, on_change: callable, **kwargs):
-            """Watches changes for the queue collection and calls
-            on_change whenever there is a change.
-
-            Args:
-                on_change (callable): The callback to call when there
-                    is a change.
-            """
-            change_stream = self.cursor()
+            changes: asyncio.Queue[dict] = asyncio.Queue()
 
-            if not self.__watching:
-                self.__watching = True
-                logger.info("Starting Queue Change Stream")
+            # Changes are passed to on_change by another task so that
+            # reading the change stream is not blocked by on_change.
+            notifier = asyncio.create_task(self.notify(changes, on_change))
 
+            try:
                 async for change in change_stream:
                     logger.debug("A change occurred")
-                    await on_change(change["fullDocument"])
 
-                if change_stream:
-                    await self.close()
+                    if change.get("fullDocument") is not None:
+                        changes.put_nowait(change["fullDocument"])
 
-                self.__watching = False
+            except asyncio.CancelledError:
+                logger.info("Queue Change Stream watch cancelled")
 
-        async def close(self):
-            """Closes the change stream cursor."""
+            finally:
+                notifier.cancel()
+                await asyncio.gather(notifier, return_exceptions=True)
+
+                # Release the server side cursor even when cancelled
+                await self.close()
 
-            if self.__change_stream_cursor:
-                logger.info("Closing queue change stream")
                 self.__watching = False
-                await self.__change_stream_cursor.close()
-                self.__change_stream_cursor = None
 
-    def __new__(
-        cls, db: AsyncIOMotorDatabase | None = None, *args, **kwargs
-    ) -> "__QueueChangeStream":
-        """Creates a new instance of `__QueueChangeStream`.
+    async def notify(self, changes: asyncio.Queue, on_change: callable):
+        """Calls on_change with the changed queues.
+
+        The changes received within `batch_window` of the first one
+        are batched. Only the latest change of each queue is kept and
+        on_change is called for each of them concurrently, at most
+        `max_concurrency` at a time. A batch is sent before the next one
+        so the changes of a queue are sent in order.
 
         Args:
-            db (AsyncIOMotorDatabase | None, optional): A mongodb database.
-                Must be provided for the first call. Defaults to None.
+            changes (asyncio.Queue): The changed queue documents.
+            on_change (callable): The callback to call for each changed
+                queue.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
 
-        Raises:
-            ValueError: If the db is not provided in the first call.
-            ValueError: If the db is not of type `AsyncIOMotorDatabase`.
+        async def send(document: dict):
+            async with semaphore:
+                await on_change(document)
 
-        Returns:
-            __QueueChangeStream: An instance of __QueueChangeStream.
-        """
+        while True:
+            document = await changes.get()
+
+            # Latest document of each queue by the queue's name
+            batch = {document.get("name"): document}
+            deadline = loop.time() + self.batch_window
+
+            while (timeout := deadline - loop.time()) > 0:
+                try:
+                    document = await asyncio.wait_for(changes.get(), timeout)
+                except TimeoutError:
+                    break
+
+                batch[document.get("name")] = document
+
+            results = await asyncio.gather(
+                *(send(document) for document in batch.values()),
+                return_exceptions=True,
+            )
+
+            for error in results:
+                if isinstance(error, Exception):
+                    logger.error("Queue change not sent: %s", error)
+
+    async def close(self):
+        """Closes the change stream cursor."""
+
+        if self.__change_stream_cursor:
+            logger.info("Closing queue change stream")
+            self.__watching = False
+            await self.__change_stream_cursor.close()
+            self.__change_stream_cursor = None
 
-        if cls._instance is None and db is None:
-            raise ValueError("db must be given for first call")
 
-        elif cls._instance is None and isinstance(db, AsyncIOMotorDatabase):
-            cls._instance = cls.__QueueChangeStream(db=db, *args, **kwargs)
+# The queue change stream of the app, created by `init_queue_change_stream`
+_instance: QueueChangeStream | None = None
 
-        elif cls._instance is None and not isinstance(
-            db, AsyncIOMotorDatabase
-        ):
+
+def init_queue_change_stream(
+    db: AsyncIOMotorDatabase, **kwargs
+) -> QueueChangeStream:
+    """Creates the queue change stream on the first call.
+
+    Later calls return the queue change stream created by the first one.
+
+    Args:
+        db (AsyncIOMotorDatabase): The database with the queue collection.
+        **kwargs: Other arguments of `QueueChangeStream`.
+
+    Raises:
+        ValueError: If the db is not of type `AsyncIOMotorDatabase`.
+
+    Returns:
+        QueueChangeStream: The queue change stream.
+    """
+    global _instance
+
+    if _instance is None:
+        if not isinstance(db, AsyncIOMotorDatabase):
             raise ValueError("db must be of type AsyncIOMotorDatabase")
 
-        return cls._instance
+        _instance = QueueChangeStream(db=db, **kwargs)
+
+    return _instance
+
 
-    def __getattribute__(self, name: str) -> Any:
-        return self._instance.__getattribute__(name)
+def get_queue_change_stream() -> QueueChangeStream | None:
+    """Gets the queue change stream, if it has been created."""
 
-    def __setattr__(self, name: str, value: Any) -> None:
-        self._instance.__setattr__(name, value)
+    return _instance
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
-import inspect
+import asyncio
+import sys
+from dataclasses import dataclass
 from typing import Any
 
 from fastapi import WebSocket, status
 from fastapi.websockets import WebSocketState
 from typing_extensions import Annotated, Doc
 
+from src.config import CONFIG
 from src.logger import logger
 
+# Compared with every connection's state on each message
+_CONNECTED = WebSocketState.CONNECTED
+_DISCONNECTED = WebSocketState.DISCONNECTED
+
 
 class ModuleNameNotFoundError(Exception):
     """
@@ -20,328 +27,469 @@ class ModuleNameNotFoundError(Exception):
         self.message = "module_name could not be determined from the stack"
 
 
+@dataclass
+class Connection:
+    """
+    An active websocket connection of the `WebsocketManager`.
+
+    Messages are queued in `messages` as ASGI `websocket.send` events and
+    sent by the `writer` task so that sending to one websocket does not wait
+    for another.
+    """
+
+    websocket: WebSocket
+    messages: asyncio.Queue[dict[str, Any]]
+    writer: asyncio.Task
+
+
 class WebsocketManager:
     """
-    A singleton class for managing websocket connections in the application.
+    Manages the websocket connections of the application.
+
+    Only one manager is used, created by `init_websocket_manager` and
+    gotten with `get_websocket_manager`.
 
     ## Example
 
         ```python
-        from src.websocket_manager import WebsocketManager
+        from src.websocket_manager import (
+            get_websocket_manager,
+            init_websocket_manager,
+        )
 
 
         # Explicitly providing the module name by passing __name__
 
-        manager = WebsocketManager(__name__) # Instantiation
-        manager.shutdown(__name__)  # Will only work if __name__ is same as
-                                    # the one used in instantiation.
+        init_websocket_manager(__name__)
+        await get_websocket_manager().shutdown(__name__)  # Will only work
+                            # if __name__ is same as the one used in init.
 
 
-        # Not providing __name__ and letting the class get it from stack
+        # Not providing __name__ and letting it be gotten from stack
 
-        manager = WebsocketManager() # module name is gotten from stack
-        manager.shutdown() # Also gotten from stack. Will only work if the
-                           # inferred module name is same as from instantiation
+        init_websocket_manager()  # module name is gotten from stack
+        await get_websocket_manager().shutdown()  # Also gotten from stack.
+                            # Will only work if the inferred module name is
+                            # same as from init.
         ```
     """
 
-    _instance: Annotated[
-        None | __WebsocketManager,
-        Doc(
-            """
-            An instance of the __WebsocketManager inner class
-            """
-        ),
-    ] = None
+    __slots__ = ("__module_name", "active_connections")
 
-    @classmethod
-    async def shutdown(cls, module_name: str | None = None):
-        """Closes and disconnects all active connections.
+    def __init__(self, module_name: str):
 
-        If `module_name` is None, it is inferred from the module calling
-        this method. That means that this method will only work if called
-        from the module where the WebsocketManager was instantiated or if
-        the `module_name` is provided while calling from a different file.
+        logger.info("Creating WebsocketManager in %s", module_name)
+
+        self.__module_name: Annotated[
+            str,
+            Doc(
+                """
+                Name of the module where the WebsocketManager was
+                instantiated.
+
+                This helps in making critical functions like `shutdown`
+                are called only in one module.
+
+                * The functions can still be called if someone explicitly
+                * knows the module where WebsocketManager was instantiated.
+                """
+            ),
+        ] = module_name
+
+        self.active_connections: Annotated[
+            dict[str, Connection],
+            Doc(
+                """
+                Mapping of the current connected websockets.
+
+                The name of the websocket has to be unique and match
+                vendor / consumer name so that the connections can be
+                easily retrieved.
+                """
+            ),
+        ] = {}
+
+    async def connect(self, name: str, websocket: WebSocket):
+        """
+        Connects a websocket and adds it to the active connections.
+
+        If a websocket with the given name exists it is closed first.
+
+        A writer task is started that sends the messages queued for the
+        websocket.
 
         Args:
-            module_name (str | None, optional): Name of the module where the
-                WebsocketManager was instantiated. Defaults to None.
+            name (str): The name of the connection.
+            websocket (WebSocket): The websocket to connect to.
         """
-        if cls._instance:
-            await cls._instance.shutdown(module_name)
 
-    class __WebsocketManager:
+        await websocket.accept()
 
-        def __init__(self, module_name: str):
+        # Close websocket mapped to name
+        if name in self.active_connections:
+            await self.close(name)
 
-            logger.info("Creating WebsocketManager in {}".format(module_name))
+        messages: asyncio.Queue[dict[str, Any]] = asyncio.Queue(
+            maxsize=CONFIG.WEBSOCKET_SEND_QUEUE_SIZE
+        )
+
+        self.active_connections[name] = Connection(
+            websocket=websocket,
+            messages=messages,
+            writer=asyncio.create_task(
+                self.__write(name, websocket, messages)
+            ),
+        )
+
+    async def close(
+        self,
+        name: str,
+        code: int = status.WS_1010_MANDATORY_EXT,
+        reason: str = "WM: Duplicate connection",
+    ):
+        """
+        Closes an active connection.
 
-            self.__module_name: Annotated[
-                str,
-                Doc(
-                    """
-                    Name of the module where the WebsocketManager was
-                    instantiated.
+        The messages queued for the websocket are not sent.
 
-                    This helps in making critical functions like `shutdown`
-                    are called only in one module.
+        Args:
+            name (str): Name mapping to the connection to close.
+            code (int): The close code.
+                Defaults to status.WS_1010_MANDATORY_EXT.
+            reason (str): The close reason.
+                Defaults to "WM: Duplicate connection".
+        """
 
-                    * The functions can still be called if someone explicitly
-                    * knows the module where WebsocketManager was instantiated.
-                    """
-                ),
-            ] = module_name
+        if connection := self.active_connections.get(name):
+            connection.writer.cancel()
 
-            self.active_connections: Annotated[
-                dict[str, WebSocket],
-                Doc(
-                    """
-                    Mapping of the current connected websockets.
+            if connection.websocket.application_state is _CONNECTED:
+                await connection.websocket.close(code=code, reason=reason)
 
-                    The name of the websocket has to be unique and match
-                    vendor / consumer name so that the connections can be
-                    easily retrieved.
-                    """
-                ),
-            ] = {}
+    def remove_connection(
+        self, name: str | None = None, websocket: WebSocket | None = None
+    ):
+        """
+        Removes a connection from the active connections.
 
-        async def connect(self, name: str, websocket: WebSocket):
-            """
-            Connects a websocket and adds it to the active connections.
+        If `websocket` is given, the connection is only removed if it is
+        still the one mapped to the name. A websocket that disconnects
+        after being replaced does not remove the new connection.
 
-            If a websocket with the given name exists it is closed first.
+        The writer task of the connection is cancelled and the messages
+        queued for it are dropped.
 
-            Args:
-                name (str): The name of the connection.
-                websocket (WebSocket): The websocket to connect to.
-            """
+        Args:
+            name (str | None): The name mapped to the connection to remove.
+                Defaults to None.
+            websocket (WebSocket | None): The websocket to remove.
+                Defaults to None.
+        """
 
-            await websocket.accept()
+        if not name:
+            return
 
-            # Close websocket mapped to name
-            await self.close(name)
+        connection = self.active_connections.get(name)
 
-            self.active_connections[name] = websocket
+        if connection and (
+            websocket is None or connection.websocket is websocket
+        ):
+            del self.active_connections[name]
 
-        async def close(self, name: str):
-            """
-            Closes an active connection.
+            connection.writer.cancel()
 
-            Args:
-                name (str): Name mapping to the connection to close.
-            """
+    async def send_personal_message(self, message: str, name: str):
+        """
+        Queues a message for the websocket under the given name.
 
-            if existing_websocket := self.active_connections.get(name):
-                if (
-                    existing_websocket.application_state
-                    == WebSocketState.CONNECTED
-                ):
-                    await existing_websocket.close(
-                        code=status.WS_1010_MANDATORY_EXT,
-                        reason="WM: Duplicate connection",
-                    )
+        The message is sent by the writer task of the connection so this
+        does not wait for the websocket. If the socket is found to be
+        disconnected, it is removed from the active_connections. If it
+        has `CONFIG.WEBSOCKET_SEND_QUEUE_SIZE` messages waiting, it is
+        closed and removed.
 
-        def remove_connection(self, name: str | None = None):
-            """
-            Removes a connection from the active connections.
+        Args:
+            message (str): The message to send
+            name (str): The name mapped to the websocket connection
+        """
 
-            Args:
-                name (str | None): The name mapped to the connection to remove.
-                    Defaults to None.
-            """
+        await self.__send(message, name)
 
-            if name:
-                try:
-                    del self.active_connections[name]
-                except KeyError:
-                    pass
+    async def send_personal_bytes(self, data: bytes, name: str):
+        """
+        Queues a binary message for the websocket under the given name.
+
+        Same as `send_personal_message` for data that is already encoded,
+        such as serialized JSON, so that it is not decoded to be sent.
+
+        Args:
+            data (bytes): The message to send
+            name (str): The name mapped to the websocket connection
+        """
+
+        await self.__send(data, name)
+
+    async def __send(self, message: str | bytes, name: str):
+        connection = self.active_connections.get(name)
+
+        if connection is None:
+            logger.warning("Invalid connection: %s", name)
+
+        elif connection.websocket.application_state is _DISCONNECTED:
+            self.remove_connection(name, connection.websocket)
+
+        elif not self.__queue(_send_event(message), connection):
+            await self.__close_slow(name, connection)
+
+    async def broadcast(self, message: str | bytes):
+        """
+        Queues a message for all the connected websockets.
 
-        async def send_personal_message(self, message: str, name: str):
-            """
-            Sends a message to the websocket under the given name.
-            If the socket is found to be disconnected, it is removed from
-            the active_connections
-
-            Args:
-                message (str): The message to send
-                name (str): The name mapped to the websocket connection
-            """
-
-            websocket = self.active_connections.get(name)
-
-            if (
-                websocket
-                and websocket.application_state == WebSocketState.CONNECTED
-            ):
-                await websocket.send_text(message)
-
-            elif (
-                websocket
-                and websocket.application_state == WebSocketState.DISCONNECTED
-            ):
-                self.remove_connection(name)
-
-            else:
-                logger.warning("Invalid connection: {0}".format(name))
-
-        async def broadcast(self, message: str):
-            """
-            Sends a message to all the connected websockets.
-
-            if a disconnected websocket is encountered, it is removed from
-            active connections.
-
-            Args:
-                message (str): The message to send.
-            """
-
-            for name, connection in self.active_connections.items():
-                if connection.application_state == WebSocketState.CONNECTED:
-                    await connection.send_text(message)
-
-                elif (
-                    connection.application_state == WebSocketState.DISCONNECTED
-                ):
-                    self.remove_connection(name)
-
-        async def shutdown(self, module_name: str | None = None):
-            """
-            Closes and disconnects all active connections.
-
-            If `module_name` is None, it is inferred from the module calling
-            this method. That means that this method will only work if called
-            from the module where the WebsocketManager was instantiated or if
-            the `module_name` is provided while calling from a different file.
-
-            Args:
-                module_name (str | None): name of the module where the WebsocketManager
-                    was initialized. Defaults to None.
-
-            Raises:
-                TypeError: If the module_name is given and is not of type str
-                ModuleNameNotFoundError: If the module_name is None and cannot be
-                    gotten from the stack
-            """
-
-            if module_name and not isinstance(module_name, str):
-                raise TypeError("module_name must be of type str or None")
-
-            if not module_name:
-                # Get module name from stack
-                module_name = self.__get_calling_module_name()
-
-            if not module_name:
-                logger.warn(
-                    "Cannot shutdown WebsocketManager. module_name could not be found."
+        A `str` is sent as a text frame and `bytes` as a binary frame.
+        Websockets with a full queue are closed and removed.
+
+        The state of the websockets is not checked here. The connections
+        are removed when their websocket disconnects, and a websocket that
+        disconnected without being removed fails to send and is removed by
+        its writer task.
+
+        Args:
+            message (str | bytes): The message to send.
+        """
+
+        # The same event is sent to all the websockets
+        event = _send_event(message)
+        slow: list[tuple[str, Connection]] = []
+
+        for name, connection in self.active_connections.items():
+            if not self.__queue(event, connection):
+                slow.append((name, connection))
+
+        if slow:
+            await asyncio.gather(
+                *(
+                    self.__close_slow(name, connection)
+                    for name, connection in slow
                 )
-                raise ModuleNameNotFoundError
+            )
+
+    @staticmethod
+    def __queue(event: dict[str, Any], connection: Connection) -> bool:
+        """
+        Queues a message for the writer task of a connection.
+
+        Returns:
+            bool: False if the queue of the connection is full.
+        """
+
+        try:
+            connection.messages.put_nowait(event)
+        except asyncio.QueueFull:
+            return False
+
+        return True
+
+    async def __close_slow(self, name: str, connection: Connection):
+        """
+        Closes and removes a connection that is not reading its messages
+        fast enough.
+        """
+
+        logger.warning("Closing slow connection: %s", name)
+
+        self.remove_connection(name, connection.websocket)
+
+        if connection.websocket.application_state is _CONNECTED:
+            await connection.websocket.close(
+                code=status.WS_1013_TRY_AGAIN_LATER,
+                reason="WM: Too many queued messages",
+            )
+
+    async def __write(
+        self, name: str, websocket: WebSocket, messages: asyncio.Queue
+    ):
+        """
+        Sends the messages queued for a websocket until the connection is
+        removed or a send fails.
 
-            if module_name == self.__module_name:
-                logger.info(
-                    "Shutting down WebsocketManager from {}".format(
-                        module_name
+        A send that takes longer than `CONFIG.WEBSOCKET_SEND_TIMEOUT_MS`
+        closes the websocket, so a client that stopped reading does not
+        keep its connection.
+        """
+
+        timeout = CONFIG.WEBSOCKET_SEND_TIMEOUT_MS / 1000
+
+        while True:
+            event = await messages.get()
+
+            try:
+                await asyncio.wait_for(websocket.send(event), timeout)
+            except TimeoutError:
+                logger.warning("Sending to %s timed out", name)
+
+                try:
+                    await asyncio.wait_for(
+                        websocket.close(
+                            code=status.WS_1013_TRY_AGAIN_LATER,
+                            reason="WM: Send timed out",
+                        ),
+                        timeout,
                     )
-                )
+                except Exception:
+                    pass
 
-                for name in self.active_connections.keys():
-                    await self.close(name)
+                self.remove_connection(name, websocket)
 
-                    self.remove_connection(name)
-            else:
-                logger.warn(
-                    "Cannot shutdown WebsocketManager. Shutdown from the module where it was created"
-                )
+                return
+            except Exception as e:
+                logger.warning("Sending to %s failed: %s", name, e)
+
+                self.remove_connection(name, websocket)
 
-        @staticmethod
-        def __get_calling_module_name() -> str | None:
-            """
-            Gets the name of the module where a method was called from
-            by checking the stack.
-            """
-
-            def _module_name(obj: object) -> str | None:
-                if module := inspect.getmodule(obj):
-                    return module.__name__
-
-            module_name: str | None = None
-            index = 1
-
-            frm = inspect.stack()[index]
-            module_name = _module_name(frm[0])
-
-            if module_name:
-                # Loop over all stack records from this module.
-                while module_name == __name__:
-                    index += 1
-                    try:
-                        frm = inspect.stack()[index]
-                        module_name = _module_name(frm[0])
-                    except IndexError:
-                        # Original call was from this module
-                        break
-
-            logger.debug("{} calling WebsocketManager".format(module_name))
-
-            return module_name
-
-    def __new__(
-        cls, module_name: str | None = None
-    ) -> __WebsocketManager | None:
+                return
+
+    async def shutdown(self, module_name: str | None = None):
         """
-        Creates a new instance of __WebsocketManager.
+        Closes and disconnects all active connections.
+
+        If `module_name` is None, it is inferred from the module calling
+        this method. That means that this method will only work if called
+        from the module where the WebsocketManager was instantiated or if
+        the `module_name` is provided while calling from a different file.
 
         Args:
-            module_name (str | None, optional): The name of the module where
-                the manager is instantiated. Defaults to None. If it is `None`,
-                it is inferred from the stack by getting the module calling the
-                class.
+            module_name (str | None): name of the module where the WebsocketManager
+                was initialized. Defaults to None.
 
         Raises:
-            TypeError: If module_name is provided and is not a string.
+            TypeError: If the module_name is given and is not of type str
+            ModuleNameNotFoundError: If the module_name is None and cannot be
+                gotten from the stack
+        """
 
-        Returns:
-            __WebsocketManager: An instance of __WebsocketManager
+        if module_name and not isinstance(module_name, str):
+            raise TypeError("module_name must be of type str or None")
 
+        if not module_name:
+            # Get module name from stack
+            module_name = _calling_module_name()
 
-        ## Example
+        if not module_name:
+            logger.warning(
+                "Cannot shutdown WebsocketManager. module_name could not be found."
+            )
+            raise ModuleNameNotFoundError
 
-        ```python
-        from src.websocket_manager import WebsocketManager
+        if module_name == self.__module_name:
+            logger.info("Shutting down WebsocketManager from %s", module_name)
 
+            # Closing cancels the writers of the connections
+            names = list(self.active_connections)
 
-        # Explicitly providing the module name by passing __name__
+            await asyncio.gather(
+                *(self.close(name) for name in names),
+                return_exceptions=True,
+            )
+
+            self.active_connections.clear()
+        else:
+            logger.warning(
+                "Cannot shutdown WebsocketManager. Shutdown from the module where it was created"
+            )
 
-        manager = WebsocketManager(__name__)    # Instantiation
-        manager.shutdown(__name__)  # Will only work if __name__ is same as the one used in instantiation.
 
+def _send_event(message: str | bytes) -> dict[str, Any]:
+    """
+    Builds the ASGI event that sends a message, as `WebSocket.send_text` and
+    `WebSocket.send_bytes` do.
 
-        # Not providing __name__ and letting the class get it from stack
+    A `str` is sent as a text frame and `bytes` as a binary frame.
+    """
 
-        manager = WebsocketManager() # module name is gotten from stack
-        manager.shutdown() # Also gotten from stack. Will only work if the
-                           # inferred module name is same as from instantiation
-        ```
-        """
+    if isinstance(message, bytes):
+        return {"type": "websocket.send", "bytes": message}
 
-        if not cls._instance and isinstance(module_name, str):
-            cls._instance = cls.__WebsocketManager(module_name=module_name)
+    return {"type": "websocket.send", "text": message}
 
-        elif not cls._instance and not module_name:
-            # Use module name from the stack
-            module_name = cls.__WebsocketManager.__get_calling_module_name()
-            cls._instance = cls.__WebsocketManager(module_name=module_name)
 
-        elif not cls._instance and (
-            module_name and not isinstance(module_name, str)
-        ):
+_instance: WebsocketManager | None = None
+
+
+def init_websocket_manager(module_name: str | None = None) -> WebsocketManager:
+    """Creates the websocket manager on the first call.
+
+    Later calls return the websocket manager created by the first one.
+
+    Args:
+        module_name (str | None, optional): The name of the module where
+            the manager is created. Defaults to None. If it is `None`, it is
+            inferred from the stack by getting the module calling this
+            function.
+
+    Raises:
+        TypeError: If module_name is provided and is not a string.
+
+    Returns:
+        WebsocketManager: The websocket manager.
+    """
+    global _instance
+
+    if _instance is None:
+        if module_name and not isinstance(module_name, str):
             raise TypeError(
                 "module_name must be provided be of type str or None"
             )
 
-        return cls._instance
+        if not module_name:
+            # Use module name from the stack
+            module_name = _calling_module_name()
+
+        _instance = WebsocketManager(module_name=module_name)
+
+    return _instance
+
+
+def get_websocket_manager() -> WebsocketManager | None:
+    """Gets the websocket manager, if it has been created."""
+
+    return _instance
+
+
+async def shutdown_websocket_manager(module_name: str | None = None):
+    """Closes and disconnects all active connections, if the websocket
+    manager has been created.
+
+    If `module_name` is None, it is inferred from the module calling
+    this function. That means that this function will only work if called
+    from the module where the websocket manager was created or if the
+    `module_name` is provided while calling from a different file.
+
+    Args:
+        module_name (str | None, optional): Name of the module where the
+            websocket manager was created. Defaults to None.
+    """
+
+    if _instance:
+        await _instance.shutdown(module_name)
+
+
+def _calling_module_name() -> str | None:
+    """
+    Gets the name of the module where a method was called from
+    by checking the stack.
+    """
+
+    # Walks the frames without building the `inspect.stack()`
+    # records, which read the source lines of every frame.
+    frame = sys._getframe(1)
+    module_name: str | None = frame.f_globals.get("__name__")
+
+    if module_name:
+        # Skip the frames from this module.
+        while module_name == __name__ and frame.f_back is not None:
+            frame = frame.f_back
+            module_name = frame.f_globals.get("__name__")
 
-    def __getattribute__(self, name: str) -> Any:
-        return self._instance.__getattribute__(name)
+    logger.debug("%s calling WebsocketManager", module_name)
 
-    def __setattr__(self, name: str, value: Any) -> None:
-        self._instance.__setattr__(name, value)
+    return module_name
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import sys
+import unittest.mock as mock
+
+import msgspec
+import pytest
+import pytest_asyncio
+
+from bson.binary import Binary, UuidRepresentation, UUID_SUBTYPE
+from datetime import datetime, timezone
+from httpx import AsyncClient, Response
+from uuid import UUID
+
+# Each pytest-xdist worker uses its own database. Set before the config is
+# loaded by importing the app.
+os.environ.setdefault(
+    "MONGODB_DATABASE",
+    "test_{}".format(os.environ.get("PYTEST_XDIST_WORKER", "gw0")),
+)
+
+from src.main import app  # noqa: E402
+
+
+def mongo_mock_from_uuid(
+    uuid: UUID, uuid_representation=UuidRepresentation.STANDARD
+) -> Binary:
+    """Override the bson.binary.Binary.from_uuid function to work for mongomock
+
+    `uuid_representation` is ignored and the uuid is encoded as if it was
+    UuidRepresentation.STANDARD
+    """
+    return Binary(uuid.bytes, UUID_SUBTYPE)
+
+
+@pytest.fixture(autouse=True, scope="session")
+def mongo_uuid():
+    """Patches `Binary.from_uuid` once for the whole session.
+
+    The function replaces it directly instead of being the side effect of a
+    mock, which would record every call.
+    """
+
+    with mock.patch.object(
+        Binary, "from_uuid", staticmethod(mongo_mock_from_uuid)
+    ):
+        yield
+
+
+def msgspec_response_json(self: Response, **kwargs):
+    """Decode the body of a response with `msgspec.json` instead of `json`"""
+    return msgspec.json.decode(self.content)
+
+
+@pytest.fixture(autouse=True, scope="session")
+def response_json():
+    """Patches `Response.json`, called by most tests, for the session."""
+
+    with mock.patch.object(Response, "json", msgspec_response_json):
+        yield
+
+
+@pytest.fixture(scope="session")
+def frozen_now():
+    """Creation and update time of the inserted test documents.
+
+    The tests do not depend on the clock.
+    """
+
+    return datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope="session")
+def anonymous_consumer_in():
+    return {
+        "id": "1cab0a6c-0e36-11ef-8ffa-e86a64c3b96e",
+        "is_anonymous": True,
+        "disabled": False,
+        "orders": [],
+    }
+
+
+@pytest.fixture(scope="session")
+def event_loop_policy():
+    """Run the tests on uvloop, like the app is served, where available"""
+
+    if sys.platform == "win32":
+        return asyncio.DefaultEventLoopPolicy()
+
+    import uvloop
+
+    return uvloop.EventLoopPolicy()
+
+
+@pytest.fixture(scope="session")
+def event_loop(event_loop_policy):
+    """Event loop shared by all the async tests and fixtures.
+
+    The app, its database client and its background tasks are created once
+    in this loop by `lifespan_app`, so the tests using them have to run in
+    the same loop.
+    """
+
+    loop = event_loop_policy.new_event_loop()
+
+    yield loop
+
+    loop.close()
+
+
+@pytest_asyncio.fixture(scope="session")
+async def lifespan_app(event_loop):
+    """App with the lifespan initiated once for the session
+
+    The lifespan context is entered directly rather than through the ASGI
+    lifespan messages, the app has no middleware depending on them.
+    """
+
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+@pytest_asyncio.fixture
+async def test_app(lifespan_app):
+    """
+    App for testing with the lifespan initiated.
+
+    The documents added to the database by a test are deleted after it.
+    The collections are emptied rather than dropped to keep their indexes.
+    """
+
+    yield lifespan_app
+
+    for name in await app.db.list_collection_names():
+        await app.db[name].delete_many({})
+
+
+@pytest_asyncio.fixture(scope="session")
+async def shared_client(lifespan_app):
+    """Client, and its connection pool, shared by the client fixtures"""
+
+    async with AsyncClient(app=lifespan_app, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def client(test_app, shared_client):
+    """Client with no overridden dependencies"""
+
+    return shared_client
+
+
+@pytest.fixture
+def client_nodb(shared_client):
+    """
+    Client for the tests that do not write to the database, which are not
+    followed by emptying the collections
+    """
+
+    return shared_client
@@ -0,0 +1,159 @@
+from typing import Annotated
+
+from unittest import mock
+
+import msgspec
+import pytest
+import pytest_asyncio
+from fastapi import Depends, FastAPI, status
+from httpx import AsyncClient
+
+from src.auth import jwt_bearer
+from src.auth.jwt_bearer import SupabaseJWTBearer, SupabaseJWTPayload
+from src.auth import utils
+from src.auth.utils import signJWT
+
+app = FastAPI()
+
+
+@app.get("/me")
+def me(
+    payload: Annotated[SupabaseJWTPayload, Depends(SupabaseJWTBearer())]
+) -> dict:
+    return msgspec.structs.asdict(payload)
+
+
+CREDENTIALS = {
+    "sub": "1cab0a6c-0e36-11ef-8ffa-e86a64c3b96e",
+    "email": "",
+    "phone": "",
+    "is_anonymous": True,
+    "user_metadata": {},
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_payload_cache():
+    jwt_bearer._payload_cache.clear()
+    yield
+    jwt_bearer._payload_cache.clear()
+
+
+@pytest_asyncio.fixture
+async def client():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def token():
+    return signJWT(**CREDENTIALS, aud="authenticated")["access_token"]
+
+
+@pytest.mark.asyncio
+async def test_bearer_ok(client, token):
+    response = await client.get(
+        "/me", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == CREDENTIALS
+
+
+@pytest.mark.asyncio
+async def test_bearer_missing_header(client):
+    response = await client.get("/me")
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert response.json() == {"detail": "Not authenticated"}
+
+
+@pytest.mark.asyncio
+async def test_bearer_missing_token(client):
+    response = await client.get("/me", headers={"Authorization": "Bearer"})
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert response.json() == {"detail": "Not authenticated"}
+
+
+@pytest.mark.asyncio
+async def test_bearer_invalid_scheme(client, token):
+    response = await client.get(
+        "/me", headers={"Authorization": f"Basic {token}"}
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert response.json() == {"detail": "Invalid authentication scheme."}
+
+
+@pytest.mark.asyncio
+async def test_bearer_invalid_token(client):
+    response = await client.get(
+        "/me", headers={"Authorization": "Bearer invalid-token"}
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert response.json() == {"detail": "Invalid token or expired token."}
+
+
+@pytest.mark.asyncio
+async def test_bearer_invalid_sub(client):
+    token = signJWT(**{**CREDENTIALS, "sub": "1234"}, aud="authenticated")
+
+    response = await client.get(
+        "/me", headers={"Authorization": f"Bearer {token["access_token"]}"}
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert response.json() == {"detail": "Invalid token or expired token."}
+
+
+@pytest.mark.asyncio
+async def test_bearer_missing_is_anonymous(client):
+    credentials = {k: v for k, v in CREDENTIALS.items() if k != "is_anonymous"}
+    token = signJWT(**credentials, aud="authenticated")
+
+    response = await client.get(
+        "/me", headers={"Authorization": f"Bearer {token["access_token"]}"}
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert response.json() == {"detail": "Invalid token or expired token."}
+
+
+@pytest.mark.asyncio
+async def test_bearer_payload_cached(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await client.get("/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    with mock.patch.object(jwt_bearer, "decodeJWT") as decode_mock:
+        response = await client.get("/me", headers=headers)
+
+        decode_mock.assert_not_called()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == CREDENTIALS
+
+
+@pytest.mark.asyncio
+async def test_bearer_secret_changed(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await client.get("/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    secret = utils._get_jwt_secret()
+
+    try:
+        utils.set_jwt_secret("another-secret")
+
+        # The cached payload of the token signed with the old secret is
+        # dropped
+        response = await client.get("/me", headers=headers)
+    finally:
+        utils.set_jwt_secret(secret)
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert response.json() == {"detail": "Invalid token or expired token."}
@@ -0,0 +1,97 @@
+import time
+from unittest import mock
+
+import jwt
+import pytest
+
+from src.auth import utils
+from src.auth.utils import decodeJWT, signJWT
+
+
+@pytest.fixture(autouse=True)
+def clear_jwt_cache():
+    utils._jwt_cache.clear()
+    yield
+    utils._jwt_cache.clear()
+
+
+def test_decode_jwt_ok():
+    token = signJWT(sub="1234", aud="authenticated")["access_token"]
+
+    payload = decodeJWT(token, "authenticated")
+
+    assert payload["sub"] == "1234"
+
+
+def test_decode_jwt_cached():
+    token = signJWT(sub="1234", aud="authenticated")["access_token"]
+
+    payload = decodeJWT(token, "authenticated")
+
+    with mock.patch.object(jwt.PyJWT, "decode") as decode_mock:
+        cached_payload = decodeJWT(token, "authenticated")
+
+        decode_mock.assert_not_called()
+
+    assert cached_payload == payload
+
+
+def test_decode_jwt_cached_per_audience():
+    token = signJWT(sub="1234", aud="authenticated")["access_token"]
+
+    assert decodeJWT(token, "authenticated")["sub"] == "1234"
+    assert decodeJWT(token, "anon") == {}
+
+
+def test_decode_jwt_invalid_not_cached():
+    assert decodeJWT("invalid-token", "authenticated") == {}
+    assert len(utils._jwt_cache) == 0
+
+
+def test_decode_jwt_cached_expired():
+    token = signJWT(
+        expiry=time.time() + 10, sub="1234", aud="authenticated"
+    )["access_token"]
+
+    assert decodeJWT(token, "authenticated")["sub"] == "1234"
+
+    with mock.patch.object(time, "time", return_value=time.time() + 20):
+        assert decodeJWT(token, "authenticated") is None
+
+    assert len(utils._jwt_cache) == 0
+
+
+def test_decode_jwt_expired_skips_verification():
+    token = signJWT(
+        expiry=time.time() - 10, sub="1234", aud="authenticated"
+    )["access_token"]
+
+    with mock.patch.object(jwt.PyJWT, "decode") as decode_mock:
+        assert decodeJWT(token, "authenticated") == {}
+
+        decode_mock.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_load_jwt_secret_resets_cache():
+    token = signJWT(sub="1234", aud="authenticated")["access_token"]
+    decodeJWT(token, "authenticated")
+
+    secret = await utils.load_jwt_secret()
+
+    assert secret == utils._get_jwt_secret()
+    assert not utils._jwt_cache
+
+
+def test_set_jwt_secret():
+    token = signJWT(sub="1234", aud="authenticated")["access_token"]
+    secret = utils._get_jwt_secret()
+
+    try:
+        utils.set_jwt_secret("another-secret")
+
+        assert decodeJWT(token, "authenticated") == {}
+    finally:
+        utils.set_jwt_secret(secret)
+
+    assert decodeJWT(token, "authenticated")["sub"] == "1234"
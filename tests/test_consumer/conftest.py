@@ -1,12 +1,46 @@
 import pytest
 import pytest_asyncio
 
-from asgi_lifespan import LifespanManager
-from httpx import AsyncClient
+from uuid import UUID
 
 from src.main import app
+from src.auth.jwt_bearer import SupabaseJWTPayload
+from src.consumer import service
+from src.consumer.models import AnonymousConsumer, SignedConsumer
 from src.consumer.dependencies import consumer_credentials
 
+# Credentials returned by the overridden `consumer_credentials`, built once
+# rather than for every request. They are not modified by the app.
+ANON_CONSUMER_CREDENTIALS = SupabaseJWTPayload(
+    sub=UUID("1cab0a6c-0e36-11ef-8ffa-e86a64c3b96e"),
+    email="",
+    phone="",
+    is_anonymous=True,
+    user_metadata={},
+)
+SIGNED_CONSUMER_CREDENTIALS = SupabaseJWTPayload(
+    sub=UUID("536bcfae-1120-11ef-b83a-e86a64c3b96e"),
+    email="one@test.com",
+    phone="0100000000",
+    is_anonymous=False,
+    user_metadata={},
+)
+
+
+def anon_consumer_credentials_override(credentials: dict | None = None):
+    return ANON_CONSUMER_CREDENTIALS
+
+
+def signed_consumer_credentials_override(credentials: dict | None = None):
+    return SIGNED_CONSUMER_CREDENTIALS
+
+
+@pytest.fixture(autouse=True)
+def clear_consumer_cache():
+    service._consumer_cache.clear()
+    yield
+    service._consumer_cache.clear()
+
 
 @pytest.fixture(scope="session")
 def anonymous_consumer_out():
@@ -46,16 +80,6 @@ def signed_consumer_created_out():
     }
 
 
-@pytest.fixture(scope="session")
-def anonymous_consumer_in():
-    return {
-        "id": "1cab0a6c-0e36-11ef-8ffa-e86a64c3b96e",
-        "is_anonymous": True,
-        "disabled": False,
-        "orders": [],
-    }
-
-
 @pytest.fixture(scope="session")
 def signed_consumer_in():
     return {
@@ -68,67 +92,69 @@ def signed_consumer_in():
     }
 
 
-@pytest_asyncio.fixture
-async def test_app():
-    """App for testing with the lifespan initiated"""
+@pytest.fixture(scope="session")
+def anonymous_consumer(anonymous_consumer_in, frozen_now):
+    """The anonymous consumer document, validated once for the session"""
+
+    return AnonymousConsumer(**anonymous_consumer_in, created_at=frozen_now)
+
+
+@pytest.fixture(scope="session")
+def signed_consumer(signed_consumer_in, frozen_now):
+    """The signed consumer document, validated once for the session"""
 
-    async with LifespanManager(app=app) as manager:
-        yield manager.app
+    return SignedConsumer(
+        **signed_consumer_in, created_at=frozen_now, updated_at=frozen_now
+    )
 
 
 @pytest_asyncio.fixture
-async def client(test_app):
-    """Client with no overridden dependencies"""
+async def inserted_anonymous_consumer(test_app, anonymous_consumer):
+    """The anonymous consumer inserted in the database for one test"""
+
+    await anonymous_consumer.insert()
 
-    async with AsyncClient(app=test_app, base_url="http://test") as client:
-        yield client
+    yield anonymous_consumer
+
+    await anonymous_consumer.delete()
 
 
 @pytest_asyncio.fixture
-async def client_anon_consumer(test_app, fastapi_dep):
+async def inserted_signed_consumer(test_app, signed_consumer):
+    """The signed consumer inserted in the database for one test"""
+
+    await signed_consumer.insert()
+
+    yield signed_consumer
+
+    await signed_consumer.delete()
+
+
+@pytest.fixture
+def client_anon_consumer(test_app, shared_client, fastapi_dep):
     """
     Client having consumer credentials dependency overridden by a function
     that returns an anonymous consumer credentials
     """
 
-    def anon_consumer_credentials_override(credentials: dict | None = None):
-        return {
-            "sub": "1cab0a6c-0e36-11ef-8ffa-e86a64c3b96e",
-            "email": "",
-            "phone": "",
-            "is_anonymous": True,
-            "user_metadata": {},
+    with fastapi_dep(app).override(
+        {
+            consumer_credentials: anon_consumer_credentials_override,
         }
+    ):
+        yield shared_client
 
-    async with AsyncClient(app=test_app, base_url="http://test") as client:
-        with fastapi_dep(app).override(
-            {
-                consumer_credentials: anon_consumer_credentials_override,
-            }
-        ):
-            yield client
 
-
-@pytest_asyncio.fixture
-async def client_signed_consumer(test_app, fastapi_dep):
+@pytest.fixture
+def client_signed_consumer(test_app, shared_client, fastapi_dep):
     """
     Client having consumer credentials dependency overridden by a function
     that returns a signed consumer consumer credentials
     """
 
-    def signed_consumer_credentials_override(credentials: dict | None = None):
-        return {
-            "sub": "536bcfae-1120-11ef-b83a-e86a64c3b96e",
-            "email": "one@test.com",
-            "phone": "0100000000",
-            "is_anonymous": False,
-            "user_metadata": {},
+    with fastapi_dep(app).override(
+        {
+            consumer_credentials: signed_consumer_credentials_override,
         }
-
-    async with AsyncClient(app=test_app, base_url="http://test") as client:
-        with fastapi_dep(app).override(
-            {
-                consumer_credentials: signed_consumer_credentials_override,
-            }
-        ):
-            yield client
+    ):
+        yield shared_client
@@ -1,8 +1,10 @@
 import pytest
 from fastapi import status
-from datetime import datetime
+from unittest import mock
 
-from src.consumer.models import AnonymousConsumer, SignedConsumer
+from pymongo.errors import DuplicateKeyError
+
+from src.consumer.service import invalidate_cached_consumer
 
 
 @pytest.mark.asyncio
@@ -18,17 +20,9 @@ async def test_get_consumer_not_authenticated(client):
 @pytest.mark.asyncio
 async def test_get_anonymous_consumer(
     client_anon_consumer,
-    anonymous_consumer_in,
+    inserted_anonymous_consumer,
     anonymous_consumer_out,
 ):
-    # insert anonymous consumer.
-    await AnonymousConsumer(
-        **{
-            **anonymous_consumer_in,
-            "created_at": datetime.now(),
-        }
-    ).insert()
-
     response = await client_anon_consumer.get("/api/consumer/me")
 
     assert response is not None
@@ -36,31 +30,36 @@ async def test_get_anonymous_consumer(
     assert response.json() == anonymous_consumer_out
 
 
-@pytest.mark.asyncio
-async def test_create_anonymous_consumer(
-    client_anon_consumer,
-    anonymous_consumer_out,
-):
+@pytest.fixture(
+    params=[
+        ("anonymous", "client_anon_consumer", "anonymous_consumer_out"),
+        ("signed", "client_signed_consumer", "signed_consumer_created_out"),
+    ],
+    ids=["anonymous", "signed"],
+)
+def consumer_kind(request):
+    """The kind of consumer, its client and its expected created output"""
 
-    response = await client_anon_consumer.post("/api/consumer/create/anonymous")
+    kind, client, consumer_out = request.param
 
-    assert response.status_code == status.HTTP_201_CREATED
-    assert response.json() == anonymous_consumer_out
+    return (
+        kind,
+        request.getfixturevalue(client),
+        request.getfixturevalue(consumer_out),
+    )
 
 
 @pytest.mark.asyncio
-async def test_duplicate_anonymous_consumer(
-    client_anon_consumer,
-    anonymous_consumer_out,
-):
+async def test_create_duplicate_consumer(consumer_kind):
+    kind, client, consumer_out = consumer_kind
 
-    response = await client_anon_consumer.post("/api/consumer/create/anonymous")
+    response = await client.post(f"/api/consumer/create/{kind}")
 
     assert response is not None
     assert response.status_code == status.HTTP_201_CREATED
-    assert response.json() == anonymous_consumer_out
+    assert response.json() == consumer_out
 
-    response1 = await client_anon_consumer.post("/api/consumer/create/anonymous")
+    response1 = await client.post(f"/api/consumer/create/{kind}")
 
     assert response1 is not None
     assert response1.status_code == status.HTTP_400_BAD_REQUEST
@@ -70,18 +69,9 @@ async def test_duplicate_anonymous_consumer(
 @pytest.mark.asyncio
 async def test_get_signed_consumer(
     client_signed_consumer,
-    signed_consumer_in,
+    inserted_signed_consumer,
     signed_consumer_out,
 ):
-    # Insert a signed consumer.
-    await SignedConsumer(
-        **{
-            **signed_consumer_in,
-            "created_at": datetime.now(),
-            "updated_at": datetime.now(),
-        }
-    ).insert()
-
     response = await client_signed_consumer.get("/api/consumer/me")
 
     assert response is not None
@@ -90,30 +80,39 @@ async def test_get_signed_consumer(
 
 
 @pytest.mark.asyncio
-async def test_create_signed_consumer(
-    client_signed_consumer,
-    signed_consumer_created_out,
+async def test_get_consumer_cached(
+    client_anon_consumer,
+    inserted_anonymous_consumer,
+    anonymous_consumer_out,
 ):
-    response = await client_signed_consumer.post("/api/consumer/create/signed")
+    consumer = inserted_anonymous_consumer
 
-    assert response is not None
-    assert response.status_code == status.HTTP_201_CREATED
-    assert response.json() == signed_consumer_created_out
+    response = await client_anon_consumer.get("/api/consumer/me")
+    assert response.status_code == status.HTTP_200_OK
 
+    # Served from the cache even though the consumer has been removed
+    await consumer.delete()
 
-@pytest.mark.asyncio
-async def test_duplicate_signed_consumer(
-    client_signed_consumer,
-    signed_consumer_created_out,
-):
-    response = await client_signed_consumer.post("/api/consumer/create/signed")
+    response = await client_anon_consumer.get("/api/consumer/me")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == anonymous_consumer_out
 
-    assert response is not None
-    assert response.status_code == status.HTTP_201_CREATED
-    assert response.json() == signed_consumer_created_out
+    invalidate_cached_consumer(consumer.id)
 
-    response1 = await client_signed_consumer.post("/api/consumer/create/signed")
+    response = await client_anon_consumer.get("/api/consumer/me")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
 
-    assert response1 is not None
-    assert response1.status_code == status.HTTP_400_BAD_REQUEST
-    assert response1.json() == {"detail": "Consumer already exists."}
+
+@pytest.mark.asyncio
+async def test_concurrently_created_anonymous_consumer(client_anon_consumer):
+    # Consumer inserted by another request after the existence check
+    with mock.patch(
+        "src.consumer.service._insert_consumer",
+        side_effect=DuplicateKeyError(""),
+    ):
+        response = await client_anon_consumer.post(
+            "/api/consumer/create/anonymous"
+        )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Consumer already exists."}
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from src import database
+
+
+@pytest.fixture(autouse=True)
+def reset_client():
+    yield
+    database._CLIENT = None
+    database._CLIENT_LOOP = None
+
+
+@pytest.mark.asyncio
+async def test_get_client_reused():
+    assert database.get_client() is database.get_client()
+
+
+@pytest.mark.asyncio
+async def test_close_client():
+    client = database.get_client()
+
+    database.close_client()
+
+    assert database.get_client() is not client
+
+
+def test_get_client_per_loop():
+    async def get_client():
+        return database.get_client()
+
+    # Runners with their own loop factory do not replace the current event
+    # loop, which the other tests share
+    with asyncio.Runner(loop_factory=asyncio.new_event_loop) as runner:
+        first = runner.run(get_client())
+
+    with asyncio.Runner(loop_factory=asyncio.new_event_loop) as runner:
+        second = runner.run(get_client())
+
+    assert first is not second
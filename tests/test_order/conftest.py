@@ -0,0 +1,81 @@
+import pytest
+
+from uuid import UUID
+
+from src.main import app
+from src.order.dependencies import consumer_id
+
+API_PREFIX = "/api/order"
+
+# Id returned by the overridden `consumer_id`
+CONSUMER_ID = UUID("1cab0a6c-0e36-11ef-8ffa-e86a64c3b96e")
+
+
+FOOD_DETAILS = {
+    "id": "6cd4a106-1200-11ef-8495-e86a64c3b96e",
+    "name": "Test food",
+    "available": True,
+    "ttp": 10,
+    "description": "This is a test food",
+    "picture": ["url to test food pic"],
+    "ingredients": [],
+    "category": [
+        "test",
+    ],
+    "price": {
+        "amount": 100.0,
+        "currency": "Ksh",
+    },
+}
+
+
+@pytest.fixture
+def vendor_in():
+    return {
+        "id": "53da6d16-113d-11ef-88b6-e86a64c3b96e",
+        "name": "Test vendor",
+        "description": "Vendor for testing",
+        "status": "Open",
+        "location": {"street": "Q avenue", "town": "X"},
+        "rating": 5.0,
+        "profile_picture": "",
+        "phone": "1234567890",
+        "email": "vendor@test.com",
+        "menu": [FOOD_DETAILS],
+        "orders": [],
+        "queue": {
+            "id": "ee6efac7-6f59-4265-bbea-e29e792bf57c",
+            "name": "Test vendor",
+            "orders": [],
+            "current_order": None,
+        },
+    }
+
+
+@pytest.fixture
+def order_in(vendor_in):
+    return {
+        "vendor_id": vendor_in["id"],
+        "foods": [
+            {
+                "food_id": FOOD_DETAILS["id"],
+                "quantity": 2,
+            }
+        ],
+        "total_price": FOOD_DETAILS["price"]["amount"] * 2,
+    }
+
+
+def consumer_id_override():
+    return CONSUMER_ID
+
+
+@pytest.fixture
+def client_with_auth_consumer(test_app, shared_client, fastapi_dep):
+    """
+    Client having the consumer id dependency overridden by a function
+    that returns the id of the anonymous consumer
+    """
+
+    with fastapi_dep(app).override({consumer_id: consumer_id_override}):
+        yield shared_client
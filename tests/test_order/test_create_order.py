@@ -0,0 +1,203 @@
+import asyncio
+
+import pytest
+from uuid import UUID
+
+from beanie import WriteRules
+from bson import Binary, DBRef
+from fastapi import status
+
+from src.queue import Queue
+from src.consumer.models import AnonymousConsumer, Consumer
+from src.vendor.models import Vendor
+
+from .conftest import API_PREFIX
+
+
+async def setup(vendor, consumer, now):
+    # Add a vendor and a consumer to the db
+    await asyncio.gather(
+        Vendor(**vendor).insert(link_rule=WriteRules.WRITE),
+        AnonymousConsumer(
+            **{
+                **consumer,
+                "created_at": now,
+            }
+        ).insert(),
+    )
+
+
+@pytest.mark.asyncio
+async def test_create_order_ok(
+    client_with_auth_consumer,
+    vendor_in,
+    anonymous_consumer_in,
+    order_in,
+    frozen_now,
+):
+    await setup(vendor_in, anonymous_consumer_in, frozen_now)
+
+    response = await client_with_auth_consumer.post(API_PREFIX, json=order_in)
+
+    assert response.status_code == status.HTTP_201_CREATED
+
+    order = response.json()
+    assert order["consumer_id"] == anonymous_consumer_in["id"]
+    assert order["status"] == "waiting"
+
+    # The order is linked in the consumer, the vendor and the queue
+    consumer = await Consumer.find_one(
+        {"_id": UUID(anonymous_consumer_in["id"])}
+    )
+    vendor = await Vendor.get(vendor_in["id"])
+    queue = await Queue.get(vendor_in["queue"]["id"])
+
+    for document in (consumer, vendor, queue):
+        await document.fetch_link("orders")
+
+        assert [o.id for o in document.orders] == [order["id"]]
+
+
+@pytest.mark.asyncio
+async def test_create_order_stores_references(
+    client_with_auth_consumer,
+    vendor_in,
+    anonymous_consumer_in,
+    order_in,
+    frozen_now,
+):
+    await setup(vendor_in, anonymous_consumer_in, frozen_now)
+
+    response = await client_with_auth_consumer.post(API_PREFIX, json=order_in)
+
+    assert response.status_code == status.HTTP_201_CREATED
+
+    order_ref = DBRef("order", response.json()["id"])
+
+    # Only a reference to the order is stored, not a copy of it
+    for document, id in (
+        (Consumer, anonymous_consumer_in["id"]),
+        (Vendor, vendor_in["id"]),
+        (Queue, vendor_in["queue"]["id"]),
+    ):
+        raw = await document.get_motor_collection().find_one(
+            {"_id": Binary.from_uuid(UUID(id))}
+        )
+
+        assert raw["orders"] == [order_ref]
+
+
+@pytest.mark.asyncio
+async def test_create_order_not_authenticated(client, order_in):
+    response = await client.post(API_PREFIX, json=order_in)
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert response.json() == {"detail": "Not authenticated"}
+
+
+@pytest.mark.asyncio
+async def test_create_order_missing_vendor(
+    client_with_auth_consumer, anonymous_consumer_in, order_in, frozen_now
+):
+    await AnonymousConsumer(
+        **{
+            **anonymous_consumer_in,
+            "created_at": frozen_now,
+        }
+    ).insert()
+
+    response = await client_with_auth_consumer.post(API_PREFIX, json=order_in)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "vendor does not exist"}
+
+
+@pytest.mark.asyncio
+async def test_create_order_wrong_total_price(
+    client_with_auth_consumer,
+    vendor_in,
+    anonymous_consumer_in,
+    order_in,
+    frozen_now,
+):
+    await setup(vendor_in, anonymous_consumer_in, frozen_now)
+
+    response = await client_with_auth_consumer.post(
+        API_PREFIX, json={**order_in, "total_price": 1.0}
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Food prices don't match"}
+
+
+@pytest.mark.asyncio
+async def test_create_order_invalid_foods(
+    client_with_auth_consumer,
+    vendor_in,
+    anonymous_consumer_in,
+    order_in,
+    frozen_now,
+):
+    await setup(vendor_in, anonymous_consumer_in, frozen_now)
+
+    invalid_food_ids = [
+        "9ac30d4e-8e5b-4bde-a0ae-0b0e6a3b4f61",
+        "b0a5b1d5-0f7e-4a8a-9a63-2f8e1c1e7d22",
+    ]
+
+    response = await client_with_auth_consumer.post(
+        API_PREFIX,
+        json={
+            **order_in,
+            "foods": order_in["foods"]
+            + [{"food_id": food_id} for food_id in invalid_food_ids],
+        },
+    )
+
+    # Only the first invalid food is reported
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {
+        "detail": "Invalid food with id: {}".format(invalid_food_ids[0])
+    }
+
+
+@pytest.mark.asyncio
+async def test_create_orders_bulk_ok(
+    client_with_auth_consumer,
+    vendor_in,
+    anonymous_consumer_in,
+    order_in,
+    frozen_now,
+):
+    await setup(vendor_in, anonymous_consumer_in, frozen_now)
+
+    response = await client_with_auth_consumer.post(
+        f"{API_PREFIX}/bulk", json=[order_in, order_in]
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+
+    order_ids = [order["id"] for order in response.json()]
+    assert len(set(order_ids)) == 2
+
+    # The orders are linked in the consumer, the vendor and the queue
+    consumer = await Consumer.find_one(
+        {"_id": UUID(anonymous_consumer_in["id"])}
+    )
+    vendor = await Vendor.get(vendor_in["id"])
+    queue = await Queue.get(vendor_in["queue"]["id"])
+
+    for document in (consumer, vendor, queue):
+        await document.fetch_link("orders")
+
+        assert [o.id for o in document.orders] == order_ids
+
+
+@pytest.mark.asyncio
+async def test_create_orders_bulk_empty(client_with_auth_consumer):
+    response = await client_with_auth_consumer.post(
+        f"{API_PREFIX}/bulk", json=[]
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Must provide at least one order"}
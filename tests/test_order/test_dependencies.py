@@ -0,0 +1,54 @@
+import pytest
+from fastapi import HTTPException
+from uuid import UUID, uuid4
+
+from src.order.dependencies import remove_duplicates, validate_total_price
+from src.order.models import FoodItem
+from src.vendor.models import Food
+
+from .conftest import FOOD_DETAILS
+
+FOOD_ID = UUID("6cd4a106-1200-11ef-8495-e86a64c3b96e")
+OTHER_FOOD_ID = UUID("9ac30d4e-8e5b-4bde-a0ae-0b0e6a3b4f61")
+
+
+def test_remove_duplicates_no_duplicates():
+    food_items = [
+        FoodItem(food_id=FOOD_ID, quantity=1),
+        FoodItem(food_id=OTHER_FOOD_ID, quantity=2),
+    ]
+
+    assert remove_duplicates(food_items) is food_items
+
+
+def test_remove_duplicates():
+    food_items = [
+        FoodItem(food_id=FOOD_ID, quantity=1),
+        FoodItem(food_id=OTHER_FOOD_ID, quantity=2),
+        FoodItem(food_id=FOOD_ID, quantity=3),
+    ]
+
+    assert remove_duplicates(food_items) == [
+        FoodItem(food_id=FOOD_ID, quantity=4),
+        FoodItem(food_id=OTHER_FOOD_ID, quantity=2),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_validate_total_price_in_cents(test_app):
+    # Ten foods of 0.1, which add up to 0.9999999999999999 one after the
+    # other and to 1.0 when summed more precisely
+    price = {**FOOD_DETAILS["price"], "amount": 0.1}
+    foods = [
+        Food(**{**FOOD_DETAILS, "id": uuid4(), "price": price})
+        for _ in range(10)
+    ]
+    await Food.insert_many(foods)
+
+    food_items = [FoodItem(food_id=food.id, quantity=1) for food in foods]
+
+    await validate_total_price(1.0, food_items)
+    await validate_total_price(0.9999999999999999, food_items)
+
+    with pytest.raises(HTTPException):
+        await validate_total_price(1.01, food_items)
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from src.order.utils import id_from_datetime
+
+
+def test_id_from_datetime_format():
+    order_id = id_from_datetime()
+
+    assert len(order_id) == 20
+    assert datetime.strptime(order_id, "%Y%m%d%H%M%S%f")
+
+
+def test_id_from_datetime_unique():
+    ids = [id_from_datetime() for _ in range(1000)]
+
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
@@ -0,0 +1,112 @@
+import asyncio
+import unittest.mock as mock
+
+import pytest
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from src.order.write_batcher import WriteBatcher
+
+
+def mock_collection(name: str, **kwargs) -> mock.Mock:
+    collection = mock.Mock(full_name=name)
+    collection.bulk_write = mock.AsyncMock(**kwargs)
+
+    return collection
+
+
+def update(id: int) -> UpdateOne:
+    return UpdateOne({"_id": id}, {"$push": {"orders": id}})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_are_batched():
+    batcher = WriteBatcher(max_batch_size=100)
+    consumers = mock_collection("db.consumer")
+    vendors = mock_collection("db.vendor")
+
+    await asyncio.gather(
+        batcher.write(consumers, [update(1)]),
+        batcher.write(vendors, [update(1)]),
+        batcher.write(consumers, [update(2), update(3)]),
+    )
+    await batcher.stop()
+
+    # One bulk_write per collection, in the order the writes were queued
+    consumers.bulk_write.assert_awaited_once_with(
+        [update(1), update(2), update(3)], ordered=True
+    )
+    vendors.bulk_write.assert_awaited_once_with([update(1)], ordered=True)
+
+
+@pytest.mark.asyncio
+async def test_batch_size_is_limited():
+    batcher = WriteBatcher(max_batch_size=2)
+    consumers = mock_collection("db.consumer")
+
+    await asyncio.gather(
+        *(batcher.write(consumers, [update(i)]) for i in range(3))
+    )
+    await batcher.stop()
+
+    assert consumers.bulk_write.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_raised_to_its_callers():
+    error = BulkWriteError({"writeErrors": [{"index": 1}]})
+    batcher = WriteBatcher(max_batch_size=100)
+    consumers = mock_collection("db.consumer", side_effect=error)
+
+    results = await asyncio.gather(
+        batcher.write(consumers, [update(1)]),
+        batcher.write(consumers, [update(2)]),
+        batcher.write(consumers, [update(3)]),
+        return_exceptions=True,
+    )
+    await batcher.stop()
+
+    # Operations before the failed one were written
+    assert results == [None, error, error]
+
+
+@pytest.mark.asyncio
+async def test_stop_writes_queued_operations():
+    batcher = WriteBatcher(max_batch_size=100)
+    consumers = mock_collection("db.consumer")
+
+    write = asyncio.create_task(batcher.write(consumers, [update(1)]))
+    await asyncio.sleep(0)
+
+    await batcher.stop()
+
+    assert write.done()
+    consumers.bulk_write.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_stop_writes_operations_queued_while_stopping():
+    batcher = WriteBatcher(max_batch_size=100)
+    consumers = mock_collection("db.consumer")
+
+    first = asyncio.create_task(batcher.write(consumers, [update(1)]))
+    await asyncio.sleep(0)
+
+    stop = asyncio.create_task(batcher.stop())
+    second = asyncio.create_task(batcher.write(consumers, [update(2)]))
+
+    await asyncio.wait_for(stop, 1)
+
+    assert first.done() and second.done()
+    assert consumers.bulk_write.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_single_write_is_not_delayed():
+    batcher = WriteBatcher(max_batch_size=100)
+    consumers = mock_collection("db.consumer")
+
+    await asyncio.wait_for(batcher.write(consumers, [update(1)]), 0.1)
+    await batcher.stop()
+
+    consumers.bulk_write.assert_awaited_once()
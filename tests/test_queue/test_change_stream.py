@@ -0,0 +1,92 @@
+import asyncio
+import unittest.mock as mock
+
+import pytest
+
+from src.queue import QueueChangeStream as ChangeStream
+
+
+def queue_change(name: str, orders: list) -> dict:
+    return {"fullDocument": {"name": name, "orders": orders}}
+
+
+class MockCursor:
+    def __init__(self, changes: list[dict]):
+        self.changes = changes
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.changes:
+            # Wait for the batch to be sent before the watch ends
+            await asyncio.sleep(0.05)
+            raise StopAsyncIteration
+
+        return self.changes.pop(0)
+
+    async def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_watch_sends_latest_change_per_queue():
+    change_stream = ChangeStream(db=mock.Mock(), batch_window_ms=10)
+    on_change = mock.AsyncMock()
+
+    cursor = MockCursor(
+        [
+            queue_change("vendor a", [1]),
+            queue_change("vendor b", [1]),
+            queue_change("vendor a", [1, 2]),
+            {"fullDocument": None},
+        ]
+    )
+
+    with mock.patch.object(change_stream, "cursor", return_value=cursor):
+        await change_stream.watch(on_change=on_change)
+
+    assert on_change.await_args_list == [
+        mock.call({"name": "vendor a", "orders": [1, 2]}),
+        mock.call({"name": "vendor b", "orders": [1]}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_watch_continues_after_on_change_error():
+    # Each change is in its own batch
+    change_stream = ChangeStream(db=mock.Mock(), batch_window_ms=0)
+    on_change = mock.AsyncMock(side_effect=[Exception("closed"), None])
+
+    cursor = MockCursor(
+        [queue_change("vendor a", [1]), queue_change("vendor a", [1, 2])]
+    )
+
+    with mock.patch.object(change_stream, "cursor", return_value=cursor):
+        await change_stream.watch(on_change=on_change)
+
+    assert on_change.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_watch_limits_concurrent_on_change():
+    change_stream = ChangeStream(
+        db=mock.Mock(), batch_window_ms=10, max_concurrency=2
+    )
+    running = 0
+    most_running = 0
+
+    async def on_change(document: dict):
+        nonlocal running, most_running
+
+        running += 1
+        most_running = max(most_running, running)
+        await asyncio.sleep(0.001)
+        running -= 1
+
+    cursor = MockCursor([queue_change(f"vendor {i}", [1]) for i in range(5)])
+
+    with mock.patch.object(change_stream, "cursor", return_value=cursor):
+        await change_stream.watch(on_change=on_change)
+
+    assert most_running == 2
@@ -1,17 +1,30 @@
+import asyncio
+
 import pytest
-import pytest_asyncio
-import unittest.mock as mock
 
-from asgi_lifespan import LifespanManager
-from httpx import AsyncClient
 from uuid import UUID
-from bson.binary import Binary, UuidRepresentation, UUID_SUBTYPE
 
+from src.auth.jwt_bearer import SupabaseJWTPayload
 from src.main import app
+from src.vendor import cache as vendor_cache
 from src.vendor.dependencies import vendor_credentials
+from src.vendor.models import Food, Vendor
 
 API_PREFIX = "/api/vendor"
 
+# Headers of the requests sending pre-encoded JSON bodies as content
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Credentials returned by the overridden `vendor_credentials`, built once
+# rather than for every request. They are not modified by the app.
+VENDOR_CREDENTIALS = SupabaseJWTPayload(
+    sub=UUID("53da6d16-113d-11ef-88b6-e86a64c3b96e"),
+    email="vendor@test.com",
+    phone="1234567890",
+    is_anonymous=False,
+    user_metadata={},
+)
+
 
 FOOD_DETAILS = {
     "id": "6cd4a106-1200-11ef-8495-e86a64c3b96e",
@@ -44,33 +57,49 @@ VENDOR_DETAILS = {
 }
 
 
-def side_effect_mongo_mock_from_uuid(
-    uuid: UUID, uuid_representation=UuidRepresentation.STANDARD
-):
-    """Override (Mock) the bson.binary.Binary.from_uuid function to work for mongomock
+async def seed_vendor(vendor_details: dict) -> Vendor:
+    """Insert a vendor with their menu and queue.
+
+    Same documents as `insert(link_rule=WriteRules.WRITE)`, which inserts
+    the linked documents one after the other, with one concurrent write
+    per collection instead.
+
+    Args:
+        vendor_details (dict): Fields of the vendor.
 
-    Code is copy pasted from the original function,
-    but `uuid_representation` is ignored and only code parts as if
-    uuid_representation == UuidRepresentation.STANDARD are used
+    Returns:
+        Vendor: The inserted vendor.
     """
-    if not isinstance(uuid, UUID):
-        raise TypeError("uuid must be an instance of uuid.UUID")
+    vendor = Vendor(**vendor_details)
+
+    writes = [vendor.insert(), vendor.queue.insert()]
+
+    if vendor.menu:
+        writes.append(Food.insert_many(vendor.menu))
+
+    await asyncio.gather(*writes)
+
+    return vendor
 
-    subtype = UUID_SUBTYPE
-    payload = uuid.bytes
 
-    return Binary(payload, subtype)
+def _clear_vendor_cache():
+    vendor_cache._vendor_cache.clear()
+    vendor_cache._menu_cache.clear()
+    vendor_cache._vendor_names.clear()
 
 
 @pytest.fixture(autouse=True)
-def mongo_uuid():
-    with mock.patch.object(
-        Binary, "from_uuid", side_effect=side_effect_mongo_mock_from_uuid
-    ):
-        yield
+def clear_vendor_cache():
+    _clear_vendor_cache()
+    yield
+    _clear_vendor_cache()
 
 
-@pytest.fixture
+# The documents below are shared by all the tests of the session and must
+# not be mutated by them, copy them first.
+
+
+@pytest.fixture(scope="session")
 def vendor_in():
     return {
         **VENDOR_DETAILS,
@@ -85,7 +114,7 @@ def vendor_in():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def vendor_out():
     return {
         **VENDOR_DETAILS,
@@ -104,12 +133,12 @@ def vendor_out():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def food_in():
     return FOOD_DETAILS
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def food_out():
     _food_out = FOOD_DETAILS.copy()
     del _food_out["id"]
@@ -117,17 +146,7 @@ def food_out():
     return _food_out
 
 
-@pytest.fixture
-def anonymous_consumer_in():
-    return {
-        "id": "1cab0a6c-0e36-11ef-8ffa-e86a64c3b96e",
-        "is_anonymous": True,
-        "disabled": False,
-        "orders": [],
-    }
-
-
-@pytest.fixture
+@pytest.fixture(scope="session")
 def order(vendor_in, anonymous_consumer_in, food_in):
     return {
         "id": "20240419000056631770",
@@ -144,7 +163,7 @@ def order(vendor_in, anonymous_consumer_in, food_in):
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def next_order(order):
     return {
         **order,
@@ -152,42 +171,20 @@ def next_order(order):
     }
 
 
-@pytest_asyncio.fixture
-async def test_app():
-    """App for testing with the lifespan initiated"""
-
-    async with LifespanManager(app=app) as manager:
-        yield manager.app
+def vendor_credentials_override(credentials: dict | None = None):
+    return VENDOR_CREDENTIALS
 
 
-@pytest_asyncio.fixture
-async def client(test_app):
-    """Client with no overridden dependencies"""
-
-    async with AsyncClient(app=test_app, base_url="http://test") as client:
-        yield client
-
-
-@pytest_asyncio.fixture
-async def client_with_auth_vendor(test_app, fastapi_dep):
+@pytest.fixture
+def client_with_auth_vendor(test_app, shared_client, fastapi_dep):
     """
     Client having vendor credentials dependency overridden by a function
     that returns an vendor credentials
     """
 
-    def vendor_credentials_override(credentials: dict | None = None):
-        return {
-            "sub": "53da6d16-113d-11ef-88b6-e86a64c3b96e",
-            "email": "vendor@test.com",
-            "phone": "1234567890",
-            "is_anonymous": False,
-            "user_metadata": {},
+    with fastapi_dep(app).override(
+        {
+            vendor_credentials: vendor_credentials_override,
         }
-
-    async with AsyncClient(app=test_app, base_url="http://test") as client:
-        with fastapi_dep(app).override(
-            {
-                vendor_credentials: vendor_credentials_override,
-            }
-        ):
-            yield client
+    ):
+        yield shared_client
@@ -1,16 +1,43 @@
+import re
+
+import msgspec
 import pytest
-from copy import deepcopy
-from fastapi import status
+from fastapi import HTTPException, status
+from pydantic_core import PydanticSerializationError, ValidationError
+from unittest import mock
 from uuid import UUID
 
-from src.vendor.models import Vendor
+from src.auth.jwt_bearer import SupabaseJWTPayload
+from src.queue import Queue
+from src.vendor.dependencies import parse_new_vendor_details
+from src.vendor.models import Vendor, VendorCreate
+from src.vendor.service import create_vendor
+
+from .conftest import API_PREFIX, JSON_HEADERS, VENDOR_DETAILS
+
+# Request bodies encoded once for the module rather than by every request
+INVALID_NAME_VENDOR_DETAILS = {**VENDOR_DETAILS, "name": ""}
+INVALID_EMAIL_VENDOR_DETAILS = {**VENDOR_DETAILS, "email": ""}
 
-from .conftest import API_PREFIX, VENDOR_DETAILS
+VENDOR_DETAILS_JSON = msgspec.json.encode(VENDOR_DETAILS)
+INVALID_NAME_VENDOR_DETAILS_JSON = msgspec.json.encode(
+    INVALID_NAME_VENDOR_DETAILS
+)
+INVALID_EMAIL_VENDOR_DETAILS_JSON = msgspec.json.encode(
+    INVALID_EMAIL_VENDOR_DETAILS
+)
+
+# Canonical form of the UUIDs in the responses
+UUID_RE = re.compile(
+    r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$"
+)
 
 
 @pytest.mark.asyncio
 async def test_create_new_vendor_not_authenticated(client, vendor_out):
-    response = await client.post(f"{API_PREFIX}/new", json=VENDOR_DETAILS)
+    response = await client.post(
+        f"{API_PREFIX}/new", content=VENDOR_DETAILS_JSON, headers=JSON_HEADERS
+    )
 
     assert response is not None
     assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -31,26 +58,27 @@ async def test_create_new_vendor_authenticated(
 
     # Create vendor
     response = await client_with_auth_vendor.post(
-        f"{API_PREFIX}/new", json=VENDOR_DETAILS
+        f"{API_PREFIX}/new", content=VENDOR_DETAILS_JSON, headers=JSON_HEADERS
     )
 
     assert response is not None
     assert response.status_code == status.HTTP_201_CREATED
 
-    _vendor_out = deepcopy(vendor_out)
-    del _vendor_out["queue"]
-
-    vendor_details_copy = deepcopy(VENDOR_DETAILS)
-
-    _vendor_out["menu"] = vendor_details_copy["menu"]
-    del _vendor_out["menu"][0]["id"]
+    # The ids of the queue and the foods are created with the vendor
+    _vendor_out = {
+        key: value for key, value in vendor_out.items() if key != "queue"
+    }
+    _vendor_out["menu"] = [
+        {key: value for key, value in food.items() if key != "id"}
+        for food in VENDOR_DETAILS["menu"]
+    ]
 
     r = response.json()
 
-    assert UUID(r["queue"]["id"])
+    assert UUID_RE.match(r["queue"]["id"])
     del r["queue"]
 
-    assert UUID(r["menu"][0]["id"])  # Ensure id is UUID
+    assert UUID_RE.match(r["menu"][0]["id"])  # Ensure id is UUID
     del r["menu"][0]["id"]
 
     assert r == _vendor_out
@@ -71,23 +99,66 @@ async def test_create_duplicate_vendor(client_with_auth_vendor, vendor_in):
 
     # Insert duplicate vendor
     response = await client_with_auth_vendor.post(
-        f"{API_PREFIX}/new", json=VENDOR_DETAILS
+        f"{API_PREFIX}/new", content=VENDOR_DETAILS_JSON, headers=JSON_HEADERS
     )
 
     assert response is not None
     assert response.status_code == status.HTTP_400_BAD_REQUEST
     assert response.json() == {"detail": "Vendor already exists."}
 
+    # The queue inserted before the vendor is removed
+    assert await Queue.find(Queue.name == VENDOR_DETAILS["name"]).count() == 0
+
+
+@pytest.mark.asyncio
+async def test_create_duplicate_vendor_unique_index(client, vendor_in):
+    await Vendor(**vendor_in).insert()
+
+    # A vendor inserted after the existence check
+    with mock.patch.object(
+        Vendor, "find_one", mock.AsyncMock(return_value=None)
+    ):
+        vendor = await create_vendor(VendorCreate(**vendor_in))
+
+    assert vendor is None
+    assert await Queue.find(Queue.name == VENDOR_DETAILS["name"]).count() == 0
+
+
+@pytest.mark.asyncio
+async def test_create_vendor_not_valid(client, vendor_in):
+    error = ValidationError.from_exception_data(
+        "Vendor", [{"type": "missing", "loc": ("name",), "input": {}}]
+    )
+
+    with mock.patch.object(Vendor, "insert", side_effect=error):
+        with pytest.raises(HTTPException) as e:
+            await create_vendor(VendorCreate(**vendor_in))
+
+    assert e.value.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_create_vendor_not_serializable(client, vendor_in):
+    error = PydanticSerializationError("Unable to serialize")
+
+    with mock.patch.object(Vendor, "insert", side_effect=error):
+        with pytest.raises(HTTPException) as e:
+            await create_vendor(VendorCreate(**vendor_in))
+
+    assert e.value.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+    assert await Queue.find(Queue.name == VENDOR_DETAILS["name"]).count() == 0
+
 
 @pytest.mark.asyncio
 async def test_create_new_vendor_invalid_name(
     client_with_auth_vendor, vendor_out
 ):
-    invalid_vendor_details = deepcopy(VENDOR_DETAILS)
-    invalid_vendor_details["name"] = ""
+    invalid_vendor_details = INVALID_NAME_VENDOR_DETAILS
 
     response = await client_with_auth_vendor.post(
-        f"{API_PREFIX}/new", json=invalid_vendor_details
+        f"{API_PREFIX}/new",
+        content=INVALID_NAME_VENDOR_DETAILS_JSON,
+        headers=JSON_HEADERS,
     )
 
     assert response is not None
@@ -114,11 +185,12 @@ async def test_create_new_vendor_invalid_name(
 async def test_create_new_vendor_invalid_email(
     client_with_auth_vendor, vendor_out
 ):
-    invalid_vendor_details = VENDOR_DETAILS.copy()
-    invalid_vendor_details["email"] = ""
+    invalid_vendor_details = INVALID_EMAIL_VENDOR_DETAILS
 
     response = await client_with_auth_vendor.post(
-        f"{API_PREFIX}/new", json=invalid_vendor_details
+        f"{API_PREFIX}/new",
+        content=INVALID_EMAIL_VENDOR_DETAILS_JSON,
+        headers=JSON_HEADERS,
     )
 
     assert response is not None
@@ -129,7 +201,7 @@ async def test_create_new_vendor_invalid_email(
                 "type": "value_error",
                 "loc": ["body", "email"],
                 "msg": "value is not a valid email address: The email address is not valid. It must have exactly one @-sign.",
-                "input": "",
+                "input": invalid_vendor_details["email"],
                 "ctx": {
                     "reason": "The email address is not valid. It must have exactly one @-sign."
                 },
@@ -140,3 +212,21 @@ async def test_create_new_vendor_invalid_email(
     created_vendor = await Vendor.get(vendor_out["id"])
 
     assert created_vendor is None
+
+
+@pytest.mark.asyncio
+async def test_parse_new_vendor_details_without_token_email():
+    credentials = SupabaseJWTPayload(
+        sub=UUID("53da6d16-113d-11ef-88b6-e86a64c3b96e"),
+        email="",
+        phone="1234567890",
+        is_anonymous=False,
+    )
+
+    vendor_create = await parse_new_vendor_details(
+        VendorCreate(**VENDOR_DETAILS), credentials
+    )
+
+    # Email from the form data is kept
+    assert vendor_create.email == VENDOR_DETAILS["email"]
+    assert vendor_create.id == credentials.sub
@@ -1,18 +1,49 @@
+import asyncio
+
+import msgspec
 import pytest
 
-from beanie import WriteRules
 from fastapi import status
 
 from src.main import app
 from src.vendor.dependencies import get_vendor_menu
 from src.vendor.models import Food, Vendor
 
-from .conftest import API_PREFIX, VENDOR_DETAILS
+from .conftest import API_PREFIX, JSON_HEADERS, VENDOR_DETAILS, seed_vendor
+
+# Food added to the menu, encoded once for the module rather than by every
+# request
+NEW_FOOD = {
+    "id": "6cd4a106-1200-11ef-8495-e86a64c3b96f",
+    "name": "Test food 1",
+    "available": False,
+    "ttp": 1,
+    "description": "Test adding using /api/vendor/menu",
+    "picture": ["url to test food pic"],
+    "ingredients": [],
+    "category": [
+        "test",
+    ],
+    "price": {
+        "amount": 100.0,
+        "currency": "Ksh",
+    },
+}
+NEW_FOOD_JSON = msgspec.json.encode(NEW_FOOD)
+
+# The added food as returned, without its id
+NEW_FOOD_OUT = {k: v for k, v in NEW_FOOD.items() if k != "id"}
+
+# Food values to update
+FOOD_UPDATE = {
+    "name": "Updated food",
+    "description": "Update a food in the menu",
+}
 
 
 @pytest.mark.asyncio
-async def test_get_vendor_menu_vendor_missing(client):
-    response = await client.get(
+async def test_get_vendor_menu_vendor_missing(client_nodb):
+    response = await client_nodb.get(
         f"{API_PREFIX}/{VENDOR_DETAILS["name"]}/menu"
     )
 
@@ -24,15 +55,11 @@ async def test_get_vendor_menu_vendor_missing(client):
 
 @pytest.mark.asyncio
 async def test_get_vendor_menu_ok(client, vendor_in, fastapi_dep, food_out):
+    # The menu is built in memory, the overridden dependency does not read
+    # the db
+    menu = [Food(**vendor_in["menu"][0])]
 
-    # Add a vendor to the db
-    await Vendor(**vendor_in).insert(link_rule=WriteRules.WRITE)
-
-    vendor = await Vendor.get(vendor_in["id"])
-
-    await vendor.fetch_link("menu")
-
-    with fastapi_dep(app).override({get_vendor_menu: lambda: vendor.menu}):
+    with fastapi_dep(app).override({get_vendor_menu: lambda: menu}):
         response = await client.get(
             f"{API_PREFIX}/{VENDOR_DETAILS["name"]}/menu"
         )
@@ -42,8 +69,46 @@ async def test_get_vendor_menu_ok(client, vendor_in, fastapi_dep, food_out):
 
 
 @pytest.mark.asyncio
-async def test_get_food_vendor_missing(client):
-    response = await client.get(
+async def test_get_vendor_menu_fetches_foods(client, vendor_in, food_out):
+    # Add a vendor to the db
+    await seed_vendor(vendor_in)
+
+    response = await client.get(f"{API_PREFIX}/{VENDOR_DETAILS["name"]}/menu")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [food_out]
+
+
+@pytest.mark.asyncio
+async def test_get_vendor_menu_cached(
+    client, client_with_auth_vendor, vendor_in, food_out
+):
+    # Add a vendor to the db
+    await seed_vendor(vendor_in)
+
+    menu_url = f"{API_PREFIX}/{VENDOR_DETAILS["name"]}/menu"
+
+    response = await client.get(menu_url)
+    assert response.json() == [food_out]
+
+    # Deleted without going through the service, the cached menu is served
+    await Food.find_all().delete()
+
+    response = await client.get(menu_url)
+    assert response.json() == [food_out]
+
+    # Adding food to the menu invalidates the cache
+    await client_with_auth_vendor.post(
+        f"{API_PREFIX}/menu", json={**food_out, "name": "New food"}
+    )
+
+    response = await client.get(menu_url)
+    assert [food["name"] for food in response.json()] == ["New food"]
+
+
+@pytest.mark.asyncio
+async def test_get_food_vendor_missing(client_nodb):
+    response = await client_nodb.get(
         f"{API_PREFIX}/{VENDOR_DETAILS["name"]}/menu/food-name"
     )
 
@@ -55,8 +120,8 @@ async def test_get_food_vendor_missing(client):
 
 @pytest.mark.asyncio
 async def test_get_food_not_found(client, vendor_in):
-    # Add a vendor to the db
-    await Vendor(**vendor_in).insert(link_rule=WriteRules.WRITE)
+    # Add a vendor to the db without inserting their menu and queue
+    await Vendor(**vendor_in).insert()
 
     response = await client.get(
         f"{API_PREFIX}/{VENDOR_DETAILS["name"]}/menu/food-name"
@@ -69,7 +134,7 @@ async def test_get_food_not_found(client, vendor_in):
 @pytest.mark.asyncio
 async def test_get_food_ok(client, vendor_in, food_out):
     # Add a vendor to the db
-    await Vendor(**vendor_in).insert(link_rule=WriteRules.WRITE)
+    await seed_vendor(vendor_in)
 
     response = await client.get(
         f"{API_PREFIX}/{vendor_in["name"]}/menu/{vendor_in["menu"][0]["name"]}"
@@ -79,37 +144,32 @@ async def test_get_food_ok(client, vendor_in, food_out):
     assert response.json() == food_out
 
 
+@pytest.mark.asyncio
+async def test_get_food_not_in_menu(client, vendor_in, food_in):
+    # Add a vendor to the db and a food that is not in their menu
+    await asyncio.gather(
+        Vendor(**{**vendor_in, "menu": []}).insert(), Food(**food_in).insert()
+    )
+
+    response = await client.get(
+        f"{API_PREFIX}/{vendor_in["name"]}/menu/{food_in["name"]}"
+    )
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json() == {"detail": "Invalid food"}
+
+
 @pytest.mark.asyncio
 async def test_add_food_to_menu_ok(client_with_auth_vendor, vendor_in):
     # Add a vendor to the db
-    await Vendor(**vendor_in).insert(link_rule=WriteRules.WRITE)
-
-    new_food = {
-        "id": "6cd4a106-1200-11ef-8495-e86a64c3b96f",
-        "name": "Test food 1",
-        "available": False,
-        "ttp": 1,
-        "description": "Test adding using /api/vendor/menu",
-        "picture": ["url to test food pic"],
-        "ingredients": [],
-        "category": [
-            "test",
-        ],
-        "price": {
-            "amount": 100.0,
-            "currency": "Ksh",
-        },
-    }
+    await seed_vendor(vendor_in)
 
     response = await client_with_auth_vendor.post(
-        f"{API_PREFIX}/menu", json=new_food
+        f"{API_PREFIX}/menu", content=NEW_FOOD_JSON, headers=JSON_HEADERS
     )
 
-    new_food_out = new_food.copy()
-    del new_food_out["id"]
-
     assert response.status_code == status.HTTP_201_CREATED
-    assert response.json() == [new_food_out]
+    assert response.json() == [NEW_FOOD_OUT]
 
     vendor = await Vendor.get(vendor_in["id"])
 
@@ -117,14 +177,14 @@ async def test_add_food_to_menu_ok(client_with_auth_vendor, vendor_in):
 
     assert vendor is not None
     assert len(vendor.menu) == 2
-    assert new_food["name"] in [
+    assert NEW_FOOD["name"] in [
         food.model_dump()["name"] for food in vendor.menu
     ]
 
 
 @pytest.mark.asyncio
-async def test_add_food_to_menu_not_authenticated(client):
-    response = await client.post(f"{API_PREFIX}/menu")
+async def test_add_food_to_menu_not_authenticated(client_nodb):
+    response = await client_nodb.post(f"{API_PREFIX}/menu")
 
     assert response.status_code == status.HTTP_403_FORBIDDEN
     assert response.json() == {"detail": "Not authenticated"}
@@ -134,25 +194,8 @@ async def test_add_food_to_menu_not_authenticated(client):
 async def test_add_food_to_menu_vendor_missing(client_with_auth_vendor):
     # Vendor not added to db
 
-    new_food = {
-        "id": "6cd4a106-1200-11ef-8495-e86a64c3b96f",
-        "name": "Test food 1",
-        "available": False,
-        "ttp": 1,
-        "description": "Test adding using /api/vendor/menu",
-        "picture": ["url to test food pic"],
-        "ingredients": [],
-        "category": [
-            "test",
-        ],
-        "price": {
-            "amount": 100.0,
-            "currency": "Ksh",
-        },
-    }
-
     response = await client_with_auth_vendor.post(
-        f"{API_PREFIX}/menu", json=new_food
+        f"{API_PREFIX}/menu", content=NEW_FOOD_JSON, headers=JSON_HEADERS
     )
 
     assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -163,8 +206,8 @@ async def test_add_food_to_menu_vendor_missing(client_with_auth_vendor):
 async def test_add_food_to_menu_validation_error(
     client_with_auth_vendor, vendor_in
 ):
-    # Add a vendor to the db
-    await Vendor(**vendor_in).insert(link_rule=WriteRules.WRITE)
+    # Add a vendor to the db without inserting their menu and queue
+    await Vendor(**vendor_in).insert()
 
     # Invalid food missing name
     invalid_food = {
@@ -195,32 +238,22 @@ async def test_update_food_in_menu_ok(
     client_with_auth_vendor, vendor_in, food_out
 ):
     # Add a vendor to the db
-    await Vendor(**vendor_in).insert(link_rule=WriteRules.WRITE)
-
-    # Food values to update
-    food_update = {
-        "name": "Updated food",
-        "description": "Update a food in the menu",
-    }
+    await seed_vendor(vendor_in)
 
     response = await client_with_auth_vendor.patch(
         f"{API_PREFIX}/menu?food_id={vendor_in["menu"][0]["id"]}",
-        json=food_update,
+        json=FOOD_UPDATE,
     )
 
-    updated_food_out = food_out.copy()
-    updated_food_out["name"] = food_update["name"]
-    updated_food_out["description"] = food_update["description"]
-
     assert response.status_code == status.HTTP_202_ACCEPTED
-    assert response.json() == updated_food_out
+    assert response.json() == {**food_out, **FOOD_UPDATE}
 
     # Check the food in db is updated
     food = await Food.get(vendor_in["menu"][0]["id"])
 
     assert food is not None
-    assert food.model_dump()["name"] == food_update["name"]
-    assert food.model_dump()["description"] == food_update["description"]
+    assert food.model_dump()["name"] == FOOD_UPDATE["name"]
+    assert food.model_dump()["description"] == FOOD_UPDATE["description"]
 
 
 @pytest.mark.asyncio
@@ -228,7 +261,7 @@ async def test_update_food_in_menu_empty_food_update(
     client_with_auth_vendor, vendor_in, food_out
 ):
     # Add a vendor to the db
-    await Vendor(**vendor_in).insert(link_rule=WriteRules.WRITE)
+    await seed_vendor(vendor_in)
 
     response = await client_with_auth_vendor.patch(
         f"{API_PREFIX}/menu?food_id={vendor_in["menu"][0]["id"]}",
@@ -249,9 +282,30 @@ async def test_update_food_in_menu_empty_food_update(
 
 
 @pytest.mark.asyncio
-async def test_update_food_in_menu_not_authenticated(client, vendor_in):
+async def test_update_food_in_menu_falsy_value(
+    client_with_auth_vendor, vendor_in, food_out
+):
+    # Add a vendor to the db
+    await seed_vendor(vendor_in)
+
+    response = await client_with_auth_vendor.patch(
+        f"{API_PREFIX}/menu?food_id={vendor_in["menu"][0]["id"]}",
+        json={"available": False, "name": None},
+    )
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json() == {**food_out, "available": False}
+
+    food = await Food.get(vendor_in["menu"][0]["id"])
+
+    assert food.available is False
+    assert food.name == vendor_in["menu"][0]["name"]
+
+
+@pytest.mark.asyncio
+async def test_update_food_in_menu_not_authenticated(client_nodb, vendor_in):
 
-    response = await client.patch(
+    response = await client_nodb.patch(
         f"{API_PREFIX}/menu?food_id={vendor_in["menu"][0]["id"]}",
     )
 
@@ -260,40 +314,50 @@ async def test_update_food_in_menu_not_authenticated(client, vendor_in):
 
 
 @pytest.mark.asyncio
-async def test_update_food_in_menu_vendor_not_found(
-    client_with_auth_vendor, food_in
+@pytest.mark.parametrize("method", ["patch", "delete"])
+@pytest.mark.parametrize(
+    "inserted, detail",
+    [("food", "Vendor not found"), ("vendor", "Invalid food id")],
+    ids=["vendor_not_found", "food_not_found"],
+)
+async def test_change_food_in_menu_not_found(
+    client_with_auth_vendor, vendor_in, food_in, method, inserted, detail
 ):
-    # Ensure the food is inserted
-    await Food(**food_in).insert()
+    # Only the food, or only the vendor without their food, is in the db
+    if inserted == "food":
+        await Food(**food_in).insert()
+    else:
+        await Vendor(**vendor_in).insert()
 
-    response = await client_with_auth_vendor.patch(
+    response = await getattr(client_with_auth_vendor, method)(
         f"{API_PREFIX}/menu?food_id={food_in["id"]}",
     )
 
     assert response.status_code == status.HTTP_400_BAD_REQUEST
-    assert response.json() == {"detail": "Vendor not found"}
+    assert response.json() == {"detail": detail}
 
 
 @pytest.mark.asyncio
-async def test_update_food_in_menu_food_not_found(
+async def test_update_food_in_menu_food_not_linked(
     client_with_auth_vendor, vendor_in, food_in
 ):
-
-    # Add a vendor to the db without inserting food
-    await Vendor(**vendor_in).insert()
+    # Add a vendor to the db and a food that is not in their menu
+    await asyncio.gather(
+        Vendor(**{**vendor_in, "menu": []}).insert(), Food(**food_in).insert()
+    )
 
     response = await client_with_auth_vendor.patch(
         f"{API_PREFIX}/menu?food_id={food_in["id"]}",
     )
 
     assert response.status_code == status.HTTP_400_BAD_REQUEST
-    assert response.json() == {"detail": "Invalid food id"}
+    assert response.json() == {"detail": "Invalid food"}
 
 
 @pytest.mark.asyncio
 async def test_delete_food_from_menu_ok(client_with_auth_vendor, vendor_in):
     # Add a vendor to the db
-    await Vendor(**vendor_in).insert(link_rule=WriteRules.WRITE)
+    await seed_vendor(vendor_in)
 
     vendor = await Vendor.get(vendor_in["id"])
 
@@ -313,40 +377,10 @@ async def test_delete_food_from_menu_ok(client_with_auth_vendor, vendor_in):
 
 
 @pytest.mark.asyncio
-async def test_delete_food_from_menu_not_authenticated(client, vendor_in):
-    response = await client.delete(
+async def test_delete_food_from_menu_not_authenticated(client_nodb, vendor_in):
+    response = await client_nodb.delete(
         f"{API_PREFIX}/menu?food_id={vendor_in["menu"][0]["id"]}",
     )
 
     assert response.status_code == status.HTTP_403_FORBIDDEN
     assert response.json() == {"detail": "Not authenticated"}
-
-
-@pytest.mark.asyncio
-async def test_delete_food_from_menu_vendor_not_found(
-    client_with_auth_vendor, food_in
-):
-    await Food(**food_in).insert()
-
-    response = await client_with_auth_vendor.delete(
-        f"{API_PREFIX}/menu?food_id={food_in["id"]}",
-    )
-
-    assert response.status_code == status.HTTP_400_BAD_REQUEST
-    assert response.json() == {"detail": "Vendor not found"}
-
-
-@pytest.mark.asyncio
-async def test_delete_food_from_menu_food_not_found(
-    client_with_auth_vendor, vendor_in
-):
-
-    # Add a vendor to the db without inserting food
-    await Vendor(**vendor_in).insert()
-
-    response = await client_with_auth_vendor.delete(
-        f"{API_PREFIX}/menu?food_id={vendor_in["menu"][0]["id"]}",
-    )
-
-    assert response.status_code == status.HTTP_400_BAD_REQUEST
-    assert response.json() == {"detail": "Invalid food id"}
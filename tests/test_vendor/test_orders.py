@@ -1,6 +1,6 @@
+import asyncio
+
 import pytest
-from datetime import datetime
-from unittest import mock
 
 from beanie import WriteRules
 from fastapi import status
@@ -10,29 +10,29 @@ from src.consumer.models import AnonymousConsumer
 from src.vendor.models import Vendor
 from src.order.models import Order
 
-from .conftest import API_PREFIX
+from .conftest import API_PREFIX, seed_vendor
 
 ORDERS_API_PREFIX = f"{API_PREFIX}/orders"
 
 
-async def setup(vendor, consumer):
-    # Add a vendor to the db
-    await Vendor(**vendor).insert(link_rule=WriteRules.WRITE)
-
-    # Add consumer to the db
-    await AnonymousConsumer(
-        **{
-            **consumer,
-            "created_at": datetime.now(),
-        }
-    ).insert()
+async def setup(vendor, consumer, now):
+    # Add a vendor and a consumer to the db
+    await asyncio.gather(
+        seed_vendor(vendor),
+        AnonymousConsumer(
+            **{
+                **consumer,
+                "created_at": now,
+            }
+        ).insert(),
+    )
 
 
 @pytest.mark.asyncio
-async def test_get_all_orders_ok(
-    client_with_auth_vendor, vendor_in, anonymous_consumer_in, order
+async def test_get_all_orders_empty(
+    client_with_auth_vendor, vendor_in, anonymous_consumer_in, frozen_now
 ):
-    await setup(vendor_in, anonymous_consumer_in)
+    await setup(vendor_in, anonymous_consumer_in, frozen_now)
 
     response = await client_with_auth_vendor.get(
         f"{ORDERS_API_PREFIX}/all"
@@ -41,6 +41,17 @@ async def test_get_all_orders_ok(
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == []
 
+
+@pytest.mark.asyncio
+async def test_get_all_orders_populated(
+    client_with_auth_vendor,
+    vendor_in,
+    anonymous_consumer_in,
+    order,
+    frozen_now,
+):
+    await setup(vendor_in, anonymous_consumer_in, frozen_now)
+
     # Add an order
     vendor = await Vendor.get(vendor_in["id"])
     vendor.orders = [Order(**order)]
@@ -55,8 +66,8 @@ async def test_get_all_orders_ok(
 
 
 @pytest.mark.asyncio
-async def test_get_all_orders_not_authenticated(client):
-    response = await client.get(f"{ORDERS_API_PREFIX}/all")
+async def test_get_all_orders_not_authenticated(client_nodb):
+    response = await client_nodb.get(f"{ORDERS_API_PREFIX}/all")
 
     assert response.status_code == status.HTTP_403_FORBIDDEN
     assert response.json() == {"detail": "Not authenticated"}
@@ -79,8 +90,10 @@ async def test_get_next_order_ok(
     anonymous_consumer_in,
     order,
     next_order,
+    monkeypatch,
+    frozen_now,
 ):
-    await setup(vendor_in, anonymous_consumer_in)
+    await setup(vendor_in, anonymous_consumer_in, frozen_now)
 
     new_order = Order(**order)
 
@@ -103,34 +116,39 @@ async def test_get_next_order_ok(
     assert len(queue.orders) == 1
     assert queue.current_order is None
 
-    with mock.patch(
-        "src.vendor.router.get_next_order_from_queue"
-    ) as next_order_mock:
-        next_order_mock.side_effect = get_next_order_from_queue_mock
+    monkeypatch.setattr(
+        "src.vendor.router.get_next_order_from_queue",
+        get_next_order_from_queue_mock,
+    )
 
-        response = await client_with_auth_vendor.get(
-            f"{ORDERS_API_PREFIX}/next"
-        )
+    response = await client_with_auth_vendor.get(
+        f"{ORDERS_API_PREFIX}/next"
+    )
 
-        assert response.status_code == status.HTTP_200_OK
-        assert response.json() == next_order
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == next_order
+
+    # Read the queue, the vendor and the order at once rather than
+    # syncing and fetching the links one after the other
+    queue, vendor, current_order = await asyncio.gather(
+        Queue.get(vendor_in["queue"]["id"]),
+        Vendor.get(vendor_in["id"]),
+        Order.get(new_order.id),
+    )
 
-        # Check current_order is set to new_order
-        # and orders is empty
-        await queue.sync()
-        await queue.fetch_link("current_order")
-        assert queue.current_order == new_order
-        assert len(queue.orders) == 0
+    # Check current_order is set to new_order
+    # and orders is empty
+    assert queue.current_order.ref.id == new_order.id
+    assert current_order.status == "processing"
+    assert len(queue.orders) == 0
 
-        # Also the order in vendor has changed accordingly
-        await vendor.sync()
-        await vendor.fetch_link("orders")
-        assert vendor.orders[0].status == "processing"
+    # Also the order in vendor has changed accordingly
+    assert vendor.orders[0].ref.id == new_order.id
 
 
 @pytest.mark.asyncio
-async def test_get_next_order_not_authenticated(client):
-    response = await client.get(f"{ORDERS_API_PREFIX}/next")
+async def test_get_next_order_not_authenticated(client_nodb):
+    response = await client_nodb.get(f"{ORDERS_API_PREFIX}/next")
 
     assert response.status_code == status.HTTP_403_FORBIDDEN
     assert response.json() == {"detail": "Not authenticated"}
@@ -151,8 +169,10 @@ async def test_get_next_order_no_orders(
     client_with_auth_vendor,
     vendor_in,
     anonymous_consumer_in,
+    monkeypatch,
+    frozen_now,
 ):
-    await setup(vendor_in, anonymous_consumer_in)
+    await setup(vendor_in, anonymous_consumer_in, frozen_now)
 
     # No order created
     vendor = await Vendor.get(vendor_in["id"])
@@ -169,21 +189,117 @@ async def test_get_next_order_no_orders(
     assert len(queue.orders) == 0
     assert queue.current_order is None
 
-    with mock.patch(
-        "src.vendor.router.get_next_order_from_queue"
-    ) as next_order_mock:
-        next_order_mock.side_effect = get_next_order_from_queue_mock
+    monkeypatch.setattr(
+        "src.vendor.router.get_next_order_from_queue",
+        get_next_order_from_queue_mock,
+    )
+
+    response = await client_with_auth_vendor.get(
+        f"{ORDERS_API_PREFIX}/next"
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() is None
+
+    # Check current_order is None
+    # and orders is empty
+    await queue.sync()
+    assert queue.current_order is None
+    assert len(queue.orders) == 0
+
+
+@pytest.mark.asyncio
+async def test_dequeue_changed_queue(
+    test_app,
+    vendor_in,
+    anonymous_consumer_in,
+    order,
+    frozen_now,
+):
+    await setup(vendor_in, anonymous_consumer_in, frozen_now)
+
+    first_order = Order(**order)
+    second_order = Order(**{**order, "id": "20240419000056631771"})
+    await Order.insert_many([first_order, second_order])
 
+    queue = await Queue.get(vendor_in["queue"]["id"])
+    await queue.enqueue(order=first_order)
+    await queue.enqueue(order=second_order)
+
+    # Fetched before the first order is dequeued
+    stale_queue = await Queue.get(vendor_in["queue"]["id"])
+
+    assert (await queue.dequeue()).id == first_order.id
+
+    # The first order is not dequeued twice
+    next_order = await stale_queue.dequeue()
+
+    assert next_order.id == second_order.id
+    assert next_order.status == "processing"
+    assert len(stale_queue.orders) == 0
+
+
+@pytest.mark.asyncio
+async def test_done_completes_current_order(
+    test_app,
+    vendor_in,
+    anonymous_consumer_in,
+    order,
+    frozen_now,
+):
+    await setup(vendor_in, anonymous_consumer_in, frozen_now)
+
+    new_order = Order(**order)
+    await new_order.insert()
+
+    queue = await Queue.get(vendor_in["queue"]["id"])
+    await queue.enqueue(order=new_order)
+    await queue.dequeue()
+
+    await queue.done()
+
+    assert queue.current_order.status == "completed"
+    assert (await Order.get(new_order.id)).status == "completed"
+
+
+@pytest.mark.asyncio
+async def test_get_next_order_from_queue_by_id(
+    client_with_auth_vendor,
+    vendor_in,
+    anonymous_consumer_in,
+    order,
+    frozen_now,
+):
+    await setup(vendor_in, anonymous_consumer_in, frozen_now)
+
+    first_order = Order(**order)
+    second_order = Order(**{**order, "id": "20240419000056631771"})
+    await Order.insert_many([first_order, second_order])
+
+    queue = await Queue.get(vendor_in["queue"]["id"])
+    await queue.enqueue(order=first_order)
+    await queue.enqueue(order=second_order)
+
+    # Dequeued in the order they were enqueued
+    for expected in (first_order, second_order):
         response = await client_with_auth_vendor.get(
             f"{ORDERS_API_PREFIX}/next"
         )
 
         assert response.status_code == status.HTTP_200_OK
-        assert response.json() is None
-
-        # Check current_order is None
-        # and orders is empty
-        await queue.sync()
-        await queue.fetch_link("current_order")
-        assert queue.current_order is None
-        assert len(queue.orders) == 0
+        assert response.json()["id"] == expected.id
+        assert response.json()["status"] == "processing"
+
+        queue = await Queue.get(vendor_in["queue"]["id"])
+        assert queue.current_order.ref.id == expected.id
+
+    assert queue.orders == []
+
+    # Empty queue
+    response = await client_with_auth_vendor.get(f"{ORDERS_API_PREFIX}/next")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() is None
+
+    queue = await Queue.get(vendor_in["queue"]["id"])
+    assert queue.current_order is None
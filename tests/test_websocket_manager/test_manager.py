@@ -0,0 +1,213 @@
+import asyncio
+import unittest.mock as mock
+
+import pytest
+from fastapi import status
+from fastapi.websockets import WebSocketState
+
+from src.websocket_manager import WebsocketManager
+
+
+def mock_websocket(
+    state: WebSocketState = WebSocketState.CONNECTED, **kwargs
+) -> mock.Mock:
+    websocket = mock.Mock(application_state=state)
+    websocket.accept = mock.AsyncMock()
+    websocket.close = mock.AsyncMock()
+    websocket.send = mock.AsyncMock(**kwargs)
+
+    return websocket
+
+
+def text_event(message: str) -> dict:
+    return {"type": "websocket.send", "text": message}
+
+
+@pytest.fixture
+def manager():
+    # A manager separate from the application's instance
+    return WebsocketManager(__name__)
+
+
+@pytest.mark.asyncio
+async def test_send_personal_message_is_sent_by_writer(manager):
+    websocket = mock_websocket()
+
+    await manager.connect("vendor a", websocket)
+
+    await manager.send_personal_message("1", "vendor a")
+    await manager.send_personal_message("2", "vendor a")
+
+    # Queued, sent once the writer task runs
+    websocket.send.assert_not_awaited()
+
+    await asyncio.sleep(0)
+
+    assert websocket.send.await_args_list == [
+        mock.call(text_event("1")),
+        mock.call(text_event("2")),
+    ]
+
+    manager.remove_connection("vendor a")
+
+
+@pytest.mark.asyncio
+async def test_send_personal_bytes_is_sent_as_binary(manager):
+    websocket = mock_websocket()
+
+    await manager.connect("vendor a", websocket)
+
+    await manager.send_personal_bytes(b"1", "vendor a")
+    await asyncio.sleep(0)
+
+    websocket.send.assert_awaited_once_with(
+        {"type": "websocket.send", "bytes": b"1"}
+    )
+
+    manager.remove_connection("vendor a")
+
+
+@pytest.mark.asyncio
+async def test_connect_closes_existing_connection(manager):
+    old_websocket = mock_websocket()
+    new_websocket = mock_websocket()
+
+    await manager.connect("vendor a", old_websocket)
+    old_writer = manager.active_connections["vendor a"].writer
+
+    await manager.connect("vendor a", new_websocket)
+    await asyncio.sleep(0)
+
+    old_websocket.close.assert_awaited_once_with(
+        code=status.WS_1010_MANDATORY_EXT, reason="WM: Duplicate connection"
+    )
+    assert old_writer.cancelled()
+
+    # A late disconnect of the old websocket keeps the new connection
+    manager.remove_connection("vendor a", old_websocket)
+
+    assert manager.active_connections["vendor a"].websocket is new_websocket
+
+    manager.remove_connection("vendor a")
+
+
+@pytest.mark.asyncio
+async def test_slow_websocket_is_closed(manager):
+    websocket = mock_websocket()
+
+    with mock.patch(
+        "src.websocket_manager.CONFIG.WEBSOCKET_SEND_QUEUE_SIZE", 1
+    ):
+        await manager.connect("vendor a", websocket)
+
+    await manager.send_personal_message("1", "vendor a")
+    await manager.send_personal_message("2", "vendor a")
+
+    websocket.close.assert_awaited_once_with(
+        code=status.WS_1013_TRY_AGAIN_LATER,
+        reason="WM: Too many queued messages",
+    )
+    assert manager.active_connections == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_send_removes_connection(manager):
+    websocket = mock_websocket(side_effect=Exception("closed"))
+
+    await manager.connect("vendor a", websocket)
+    await manager.send_personal_message("1", "vendor a")
+
+    await asyncio.sleep(0)
+
+    assert manager.active_connections == {}
+
+
+@pytest.mark.asyncio
+async def test_broadcast_is_queued_for_connected_websockets(manager):
+    vendor_a = mock_websocket()
+    vendor_b = mock_websocket()
+    disconnected = mock_websocket(side_effect=RuntimeError("disconnected"))
+
+    await manager.connect("vendor a", vendor_a)
+    await manager.connect("vendor b", vendor_b)
+    await manager.connect("vendor c", disconnected)
+
+    disconnected.application_state = WebSocketState.DISCONNECTED
+
+    await manager.broadcast("message")
+    await asyncio.sleep(0)
+
+    vendor_a.send.assert_awaited_once_with(text_event("message"))
+    vendor_b.send.assert_awaited_once_with(text_event("message"))
+
+    # Removed by its writer once the send fails
+
+    assert list(manager.active_connections) == ["vendor a", "vendor b"]
+
+    manager.remove_connection("vendor a")
+    manager.remove_connection("vendor b")
+
+
+@pytest.mark.asyncio
+async def test_shutdown_from_calling_module(manager):
+    websocket = mock_websocket()
+
+    await manager.connect("vendor a", websocket)
+
+    # The module name is inferred from this module, where the manager was
+    # created
+    await manager.shutdown()
+
+    websocket.close.assert_awaited_once()
+    assert manager.active_connections == {}
+
+
+@pytest.mark.asyncio
+async def test_shutdown_closes_all_connections(manager):
+    vendor_a = mock_websocket()
+    failed = mock_websocket()
+    failed.close.side_effect = Exception("closed")
+
+    await manager.connect("vendor a", vendor_a)
+    await manager.connect("vendor b", failed)
+
+    await manager.shutdown(__name__)
+
+    vendor_a.close.assert_awaited_once()
+    failed.close.assert_awaited_once()
+    assert manager.active_connections == {}
+
+
+@pytest.mark.asyncio
+async def test_shutdown_from_other_module():
+    websocket = mock_websocket()
+    manager = WebsocketManager("src.app")
+
+    await manager.connect("vendor a", websocket)
+    await manager.shutdown()
+
+    websocket.close.assert_not_awaited()
+
+    manager.remove_connection("vendor a")
+
+
+@pytest.mark.asyncio
+async def test_send_timeout_closes_websocket(manager):
+    async def slow_send(message: str):
+        await asyncio.sleep(1)
+
+    websocket = mock_websocket(side_effect=slow_send)
+
+    with mock.patch(
+        "src.websocket_manager.CONFIG.WEBSOCKET_SEND_TIMEOUT_MS", 10
+    ):
+        await manager.connect("vendor a", websocket)
+        writer = manager.active_connections["vendor a"].writer
+
+        await manager.send_personal_message("1", "vendor a")
+        await asyncio.wait([writer])
+
+    websocket.close.assert_awaited_once_with(
+        code=status.WS_1013_TRY_AGAIN_LATER, reason="WM: Send timed out"
+    )
+    assert manager.active_connections == {}